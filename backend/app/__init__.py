@@ -1,29 +1,40 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
-import logging
-import sys
+import time
 
 # Load environment variables
 load_dotenv()
 
+# Probe and scrape endpoints, left out of the access log
+PROBE_PATHS = ('/health', '/health/live', '/health/ready', '/api/health', '/api/metrics')
+
+class EasyXpenseApp(Flask):
+    """
+    Flask app whose `db` is the current process's MongoDB database, or None
+    while the health checker finds it unreachable (routes answer 503).
+    """
+    mongo = None
+    health = None
+    
+    @property
+    def db(self):
+        if self.mongo is None or (self.health is not None and self.health.database_down):
+            return None
+        return self.mongo.database
+
 def create_app():
-    app = Flask(__name__)
-    
-    # Enhanced logging configuration
-    if os.getenv('FLASK_ENV') == 'production':
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s %(levelname)s: %(message)s',
-            handlers=[logging.StreamHandler(sys.stdout)]
-        )
-    else:
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='%(asctime)s %(levelname)s: %(message)s'
-        )
+    app = EasyXpenseApp(__name__)
+    
+    # Serialize ObjectId/datetime/Decimal128 directly when jsonifying documents
+    from app.utils.json_provider import BSONJSONProvider
+    app.json = BSONJSONProvider(app)
+    
+    # Structured logging written by a background thread
+    from app.utils.logs import configure_logging, RequestLogSampler
+    configure_logging(production=os.getenv('FLASK_ENV') == 'production')
+    request_log_sampler = RequestLogSampler.from_env()
     
     app.logger.info('Starting EasyXpense Backend...')
     
@@ -52,25 +63,132 @@ def create_app():
     # Request size limits (10MB max)
     app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
     
-    # MongoDB connection with timeouts
-    app.db = None
-    try:
-        app.logger.info('Connecting to MongoDB...')
-        client = MongoClient(
-            mongo_uri, 
-            serverSelectionTimeoutMS=10000,
-            connectTimeoutMS=10000,
-            socketTimeoutMS=10000,
-            maxPoolSize=10,
-            minPoolSize=1
-        )
-        app.db = client['EasyXpense']
-        app.db.command('ping')
-        app.logger.info(f'✓ MongoDB connected successfully to database: {app.db.name}')
-    except Exception as e:
-        app.logger.error(f'✗ MongoDB connection failed: {e}')
-        app.db = None
-        raise RuntimeError(f'Failed to connect to MongoDB: {e}')
+    # Return list/export reads as RawBSONDocument and decode them while serializing
+    app.config['RAW_BSON_READS'] = os.getenv('MONGO_RAW_BSON', 'false').lower() == 'true'
+    
+    # CPU time budget for /api/debts?optimize=exact before falling back to greedy
+    app.config['EXACT_SOLVER_BUDGET'] = float(os.getenv('EXACT_SOLVER_BUDGET_MS', '200')) / 1000
+    
+    # Per-process cache of computed /api/debts responses
+    from app.utils.cache import LRUCache
+    app.debts_cache = LRUCache(
+        max_entries=int(os.getenv('DEBTS_CACHE_SIZE', '256')),
+        ttl_seconds=int(os.getenv('DEBTS_CACHE_TTL', '300'))
+    )
+    
+    # Prometheus-style metrics, merged across workers by /api/metrics
+    from app.utils.metrics import Metrics, CommandMetricsListener, PoolMetricsListener
+    app.metrics = Metrics(flush_interval=int(os.getenv('METRICS_FLUSH_INTERVAL', '10')))
+    app.metrics.add_collector(lambda: [
+        ('easyxpense_debts_cache_hits_total', (), app.debts_cache.hits),
+        ('easyxpense_debts_cache_misses_total', (), app.debts_cache.misses),
+    ])
+    
+    # MongoDB connection with timeouts; the client itself is created per
+    # process on first use, so forked workers never share one
+    from app.utils.mongo import MongoConnection, mongo_pool_size
+    app.mongo = MongoConnection(
+        mongo_uri,
+        os.getenv('MONGO_DATABASE', 'EasyXpense'),
+        serverSelectionTimeoutMS=10000,
+        connectTimeoutMS=10000,
+        socketTimeoutMS=10000,
+        maxPoolSize=mongo_pool_size(),
+        minPoolSize=1,
+        waitQueueTimeoutMS=int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        event_listeners=[CommandMetricsListener(app.metrics), PoolMetricsListener(app.metrics)]
+    )
+    
+    # Startup does not wait for MongoDB: a per-worker checker connects in the
+    # background, creates indexes, warms caches and then reports ready
+    from app.utils.health import HealthChecker
+    app.health = HealthChecker(
+        app,
+        interval=int(os.getenv('HEALTH_CHECK_INTERVAL', '10')),
+        warm_indexes=os.getenv('WARMUP_INDEXES', 'true').lower() == 'true',
+        warm_groups=int(os.getenv('WARMUP_GROUPS', '0'))
+    )
+    
+    # Per-client/per-group rate limits and a bound on concurrent requests
+    from app.utils.admission import AdmissionController, parse_costs, retry_after
+    app.admission = AdmissionController(
+        ip_rate=float(os.getenv('RATE_LIMIT_IP_RATE', '20')),
+        ip_burst=float(os.getenv('RATE_LIMIT_IP_BURST', '60')),
+        group_rate=float(os.getenv('RATE_LIMIT_GROUP_RATE', '50')),
+        group_burst=float(os.getenv('RATE_LIMIT_GROUP_BURST', '150')),
+        max_in_flight=int(os.getenv('MAX_IN_FLIGHT') or mongo_pool_size()),
+        route_costs=parse_costs(os.getenv('RATE_LIMIT_ROUTE_COSTS')),
+        trust_proxy=os.getenv('TRUST_PROXY_HEADERS', 'false').lower() == 'true'
+    )
+    admission_enabled = os.getenv('ADMISSION_CONTROL', 'true').lower() == 'true'
+    
+    # Background removal of deleted groups' data
+    from app.utils.reaper import GroupReaper
+    app.reaper = GroupReaper(
+        app,
+        interval=int(os.getenv('REAPER_INTERVAL', '30')),
+        batch_size=int(os.getenv('REAPER_BATCH_SIZE', '1000')),
+        enabled=os.getenv('REAPER_ENABLED', 'true').lower() == 'true'
+    )
+    
+    # Request latency and status counts, plus the sampled access log
+    @app.before_request
+    def start_timer():
+        app.metrics.ensure_worker()
+        app.reaper.ensure_started()
+        app.health.ensure_started()
+        g.request_started = time.perf_counter()
+    
+    # Reject over-limit requests before any work is done for them
+    @app.before_request
+    def admit_request():
+        cost = app.admission.cost(request)
+        if not admission_enabled or cost == 0:
+            return None
+        rejected = app.admission.admit(request, cost)
+        if rejected is None:
+            g.admitted = True
+            app.metrics.add_gauge('easyxpense_requests_in_flight', (), 1)
+            return None
+        
+        status, reason, wait = rejected
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        app.metrics.inc('easyxpense_requests_shed_total', (route, reason))
+        error = 'Too many requests' if status == 429 else 'Server busy, please retry'
+        response = jsonify({'success': False, 'error': error})
+        response.status_code = status
+        response.headers['Retry-After'] = retry_after(wait)
+        return response
+    
+    @app.teardown_request
+    def release_request(exc):
+        if g.pop('admitted', False):
+            app.admission.release()
+            app.metrics.add_gauge('easyxpense_requests_in_flight', (), -1)
+    
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            duration = time.perf_counter() - started
+            blueprint = request.blueprint or 'app'
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            app.metrics.observe('easyxpense_http_request_duration_seconds',
+                                (blueprint, route, request.method), duration)
+            app.metrics.inc('easyxpense_http_requests_total',
+                            (blueprint, route, request.method, str(response.status_code)))
+            
+            # Skip logging for health checks
+            if request.path not in PROBE_PATHS and \
+                    request_log_sampler.should_log(route, response.status_code, duration * 1000):
+                app.logger.info(
+                    '%s %s %s %.1fms from %s', request.method, request.path, response.status_code,
+                    duration * 1000, request.remote_addr,
+                    extra={'method': request.method, 'path': request.path, 'route': route,
+                           'status': response.status_code, 'duration_ms': round(duration * 1000, 1),
+                           'remote_addr': request.remote_addr}
+                )
+        return response
     
     # Security headers middleware
     @app.after_request
@@ -81,18 +199,26 @@ def create_app():
         response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
         return response
     
-    # Request validation and logging
+    # gzip/brotli for JSON responses (runs before the hooks above, so request
+    # latency includes compression time)
+    if os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true':
+        from app.utils.compression import Compressor
+        compressor = Compressor(
+            min_size=int(os.getenv('COMPRESSION_MIN_SIZE', '1024')),
+            gzip_level=int(os.getenv('GZIP_LEVEL', '4')),
+            brotli_quality=int(os.getenv('BROTLI_QUALITY', '4'))
+        )
+        
+        @app.after_request
+        def compress_response(response):
+            return compressor.process(request, response)
+    
+    # Request validation (access logging happens after the response)
     @app.before_request
     def log_and_validate():
-        # Skip logging for health checks
-        if request.path in ['/health', '/api/health']:
-            return
-        
-        app.logger.info(f'{request.method} {request.path} from {request.remote_addr}')
-        
         # Validate Content-Type for POST/PUT
         if request.method in ['POST', 'PUT']:
-            if request.content_type and 'application/json' not in request.content_type:
+            if request.content_type and request.mimetype not in ('application/json', 'application/x-ndjson'):
                 return jsonify({'success': False, 'error': 'Content-Type must be application/json'}), 400
     
     # Register blueprints
@@ -103,6 +229,7 @@ def create_app():
         from app.routes.debts import debts_bp
         from app.routes.health import health_bp
         from app.routes.groups import groups_bp
+        from app.routes.metrics import metrics_bp
         
         app.register_blueprint(friends_bp, url_prefix='/api')
         app.register_blueprint(expenses_bp, url_prefix='/api')
@@ -110,48 +237,46 @@ def create_app():
         app.register_blueprint(debts_bp, url_prefix='/api')
         app.register_blueprint(health_bp, url_prefix='/api')
         app.register_blueprint(groups_bp, url_prefix='/api')
+        app.register_blueprint(metrics_bp, url_prefix='/api')
         
         app.logger.info('All blueprints registered successfully')
     except Exception as e:
         app.logger.error(f'Failed to register blueprints: {e}')
         raise
     
+    # Maintenance CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+    
     # Root endpoint
     @app.route('/', methods=['GET', 'HEAD'])
     def root():
         """Root endpoint for backend status"""
-        try:
-            db_status = 'connected' if app.db is not None else 'disconnected'
-            return jsonify({
-                'status': 'ok',
-                'service': 'EasyXpense Backend',
-                'environment': os.getenv('FLASK_ENV', 'development'),
-                'database': db_status
-            }), 200
-        except Exception as e:
-            app.logger.error(f'Root endpoint error: {e}')
-            return jsonify({
-                'status': 'error',
-                'service': 'EasyXpense Backend',
-                'database': 'unknown'
-            }), 200
-    
-    # Health endpoint for monitoring
+        return jsonify({
+            'status': 'ok',
+            'service': 'EasyXpense Backend',
+            'environment': os.getenv('FLASK_ENV', 'development'),
+            'database': app.health.database
+        }), 200
+    
+    # Health endpoint for monitoring (cached state, never touches MongoDB)
     @app.route('/health', methods=['GET', 'HEAD'])
     def health():
         """Simple health check for Render monitoring"""
-        try:
-            db_status = 'connected' if app.db is not None else 'disconnected'
-            return jsonify({
-                'status': 'healthy',
-                'database': db_status
-            }), 200
-        except Exception as e:
-            app.logger.error(f'Health check error: {e}')
-            return jsonify({
-                'status': 'healthy',
-                'database': 'unknown'
-            }), 200
+        return jsonify({
+            'status': 'healthy' if app.health.ready else 'degraded',
+            'database': app.health.database
+        }), 200
+    
+    # Liveness: the worker is serving requests
+    @app.route('/health/live', methods=['GET', 'HEAD'])
+    def liveness():
+        return jsonify({'status': 'alive'}), 200
+    
+    # Readiness: MongoDB reachable and warmup finished
+    @app.route('/health/ready', methods=['GET', 'HEAD'])
+    def readiness():
+        return jsonify(app.health.status()), 200 if app.health.ready else 503
     
     # Enhanced error handlers
     @app.errorhandler(400)
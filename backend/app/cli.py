@@ -0,0 +1,53 @@
+"""Flask CLI maintenance commands (run with `flask --app wsgi <command>`)"""
+import click
+
+
+def register_commands(app):
+    @app.cli.command('rebuild-balances')
+    @click.option('--group-id', default=None, help='Rebuild a single group (default: every group)')
+    @click.option('--clear-pending', is_flag=True,
+                  help='Drop in-flight writer leases without waiting for them to expire (only while no writes are running)')
+    def rebuild_balances(group_id, clear_pending):
+        """Recompute the balance ledger from expense and settlement history"""
+        from app.models.balance import Balance
+
+        balance_model = Balance(app.db)
+        if group_id:
+            balances = balance_model.rebuild(group_id, clear_pending=clear_pending)
+            click.echo(f'Rebuilt group {group_id}: {len(balances)} members')
+        else:
+            count = balance_model.rebuild_all(clear_pending=clear_pending)
+            click.echo(f'Rebuilt {count} balance scopes')
+
+    @app.cli.command('reap-groups')
+    @click.option('--batch-size', default=1000, show_default=True, help='Documents deleted per batch')
+    def reap_groups(batch_size):
+        """Remove the data of deleted groups now (resumes interrupted runs)"""
+        from app.utils.reaper import reap_deleted_groups
+
+        reaped = reap_deleted_groups(app.db, batch_size)
+        click.echo(f'Reaped {len(reaped)} deleted groups')
+
+    @app.cli.command('ensure-indexes')
+    @click.option('--prune', is_flag=True, help='Also drop indexes that are not declared and rebuild changed ones')
+    @click.option('--dedupe', is_flag=True, help='Remove documents that would violate a unique index before building it')
+    def ensure_indexes_command(prune, dedupe):
+        """Create declared indexes and report drift"""
+        from app.models.indexes import ensure_indexes
+
+        report = ensure_indexes(app.db, prune=prune, dedupe=dedupe)
+        for action in ('created', 'dropped', 'deduplicated', 'conflicts', 'failed'):
+            click.echo(f'{action}: {", ".join(report[action]) or "none"}')
+        if report['conflicts'] or report['failed']:
+            raise SystemExit(1)
+
+    @app.cli.command('check-indexes')
+    def check_indexes_command():
+        """Fail if any route query falls back to a collection scan"""
+        from app.models.indexes import find_collscans
+
+        offenders = find_collscans(app.db)
+        if offenders:
+            click.echo(f'COLLSCAN: {", ".join(offenders)}')
+            raise SystemExit(1)
+        click.echo('All route queries use an index')
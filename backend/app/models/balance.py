@@ -0,0 +1,301 @@
+"""
+Materialized balance ledger.
+
+Holds one document per (group_id, member) with the member's net balance in
+paisa, kept current with $inc on every expense and settlement write, so
+reading a group's balances costs O(members) instead of O(history).
+
+Every scope also has a header document (member=None) carrying a version
+counter and a lease per in-flight writer. rebuild() uses both to detect
+concurrent writes and retries instead of overwriting them; if the writers do
+not clear, the scope stays stale and reads fold the history in Python. A
+lease expires after WRITER_LEASE_SECONDS, so a worker killed mid-write
+does not hold its scopes stale for good.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.utils.debt_optimizer import calculate_net_balances
+from app.models.group import Group
+
+logger = logging.getLogger(__name__)
+
+# Scope holding balances across every group (used when no group_id is given)
+ALL_GROUPS = '*'
+
+EXPENSE_FIELDS = {'_id': 0, 'payer': 1, 'amount_paisa': 1, 'participant_shares': 1}
+SETTLEMENT_FIELDS = {'_id': 0, 'fromUser': 1, 'toUser': 1, 'amount_paisa': 1}
+
+# A writer that has not committed after this long is presumed dead (no
+# request outlives gunicorn's 120s timeout) and stops holding rebuilds back
+WRITER_LEASE_SECONDS = 120
+
+
+class LedgerBusy(RuntimeError):
+    """A rebuild gave up because writers kept racing it; the scope stays stale"""
+
+
+class Balance:
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.balances
+
+    def _scopes(self, group_id):
+        """Ledger scopes touched by a write to group_id"""
+        return [group_id, ALL_GROUPS] if group_id else [ALL_GROUPS]
+
+    def _header(self, scope):
+        return {'group_id': scope, 'member': None}
+
+    def begin_write(self, group_id):
+        """
+        Register an in-flight write so a concurrent rebuild waits for it.
+        Returns the writer's token for commit_write.
+        """
+        token = ObjectId()
+        writer = {'id': token, 'expires': datetime.utcnow() + timedelta(seconds=WRITER_LEASE_SECONDS)}
+        self.collection.bulk_write([
+            UpdateOne(self._header(scope), {'$inc': {'version': 1}, '$push': {'writers': writer}}, upsert=True)
+            for scope in self._scopes(group_id)
+        ], ordered=False)
+        return token
+
+    def commit_write(self, group_id, deltas, token):
+        """Apply balance deltas (paisa) and release the in-flight write"""
+        operations = []
+        for scope in self._scopes(group_id):
+            for member, delta in deltas.items():
+                if delta:
+                    operations.append(UpdateOne(
+                        {'group_id': scope, 'member': member},
+                        {'$inc': {'balance_paisa': delta, 'version': 1}},
+                        upsert=True
+                    ))
+            operations.append(UpdateOne(
+                self._header(scope),
+                {'$inc': {'version': 1}, '$pull': {'writers': {'id': token}}},
+                upsert=True
+            ))
+        self.collection.bulk_write(operations, ordered=False)
+
+    def invalidate(self, group_id):
+        """Force the next read of these scopes to rebuild from history"""
+        self.collection.update_many(
+            {'group_id': {'$in': self._scopes(group_id)}, 'member': None},
+            {'$set': {'ready': False}, '$inc': {'version': 1}}
+        )
+
+    def record(self, group_id, write, deltas):
+        """
+        Run write() and fold its balance deltas into the ledger.
+        deltas is a {member: paisa} dict, or a callable that builds one from
+        write()'s result. Returns whatever write() returns.
+        """
+        token = self.begin_write(group_id)
+        try:
+            result = write()
+        except Exception:
+            try:
+                self.commit_write(group_id, {}, token)
+                # The write may have partly happened (e.g. some of an
+                # insert_many before a network error); rebuild on next read
+                self.invalidate(group_id)
+            except Exception as e:
+                logger.error('Failed to release balance ledger write: %s', e)
+            raise
+
+        try:
+            self.commit_write(group_id, deltas(result) if callable(deltas) else deltas, token)
+        except Exception as e:
+            # The write itself succeeded; mark the ledger stale rather than fail it
+            logger.error('Balance ledger update failed for group %s: %s', group_id, e)
+            try:
+                self.invalidate(group_id)
+            except Exception:
+                pass
+
+        return result
+
+    def get_balances(self, group_id=None):
+        """Get net balances (paisa) per member, rebuilding the ledger if needed"""
+        scope = group_id or ALL_GROUPS
+
+        docs = list(self.collection.find(
+            {'group_id': scope},
+            {'_id': 0, 'member': 1, 'balance_paisa': 1, 'ready': 1}
+        ))
+        header = next((doc for doc in docs if doc.get('member') is None), None)
+
+        if header is None or not header.get('ready'):
+            return self._rebuild_or_fold(scope)
+
+        return {
+            doc['member']: doc.get('balance_paisa', 0)
+            for doc in docs
+            if doc.get('member') is not None
+        }
+
+    def get_member_balance(self, group_id, member):
+        """One member's net balance (paisa): reads two ledger rows, not the group"""
+        scope = group_id or ALL_GROUPS
+
+        docs = list(self.collection.find(
+            {'group_id': scope, 'member': {'$in': [None, member]}},
+            {'_id': 0, 'member': 1, 'balance_paisa': 1, 'ready': 1}
+        ))
+        header = next((doc for doc in docs if doc.get('member') is None), None)
+
+        if header is None or not header.get('ready'):
+            return self._rebuild_or_fold(scope).get(member, 0)
+
+        return next((doc.get('balance_paisa', 0) for doc in docs if doc.get('member') == member), 0)
+
+    def _rebuild_or_fold(self, scope):
+        """Rebuild a stale scope; while writers are in flight, answer from history without touching the ledger"""
+        try:
+            # Never sleep on writers inside a request: folding is correct now
+            return self.rebuild(scope, wait_for_writers=False)
+        except LedgerBusy as e:
+            logger.warning('%s; folding history instead', e)
+            query = Group(self.db).live_query(None if scope == ALL_GROUPS else scope)
+            return {} if query is None else self._fold(query)
+
+    def _fold(self, query):
+        return calculate_net_balances(
+            self.db.expenses.find(query, EXPENSE_FIELDS),
+            self.db.settlements.find(query, SETTLEMENT_FIELDS)
+        )
+
+    def rebuild(self, scope, max_attempts=5, wait_for_writers=True, clear_pending=False):
+        """
+        Recompute a scope's balances from its full expense/settlement history.
+
+        The header is marked not ready before any member document is
+        touched and only marked ready again by a compare-and-set on its
+        version at the end, so a failed attempt never leaves half-written
+        rows looking valid. Member documents are overwritten with
+        compare-and-set on their version; if a writer raced the rebuild it
+        starts over.
+
+        A rebuild never runs while writers hold unexpired leases: it waits
+        for them (or, with wait_for_writers=False, gives up at once) and
+        raises LedgerBusy, leaving the scope stale. clear_pending (operator
+        use only, while no writes are running) proceeds on the last attempt
+        and drops every lease instead.
+        
+        Data of deleted groups awaiting the reaper is left out; a deleted
+        group's own scope is not rebuilt at all.
+        """
+        query = Group(self.db).live_query(None if scope == ALL_GROUPS else scope)
+        if query is None:
+            return {}
+        
+        header_filter = self._header(scope)
+        self.collection.update_one(
+            header_filter,
+            {'$setOnInsert': {'version': 0, 'writers': []}},
+            upsert=True
+        )
+
+        for attempt in range(max_attempts):
+            force = clear_pending and attempt == max_attempts - 1
+            now = datetime.utcnow()
+            header = self.collection.find_one(header_filter, {'_id': 0, 'version': 1, 'writers': 1}) or {}
+
+            writers = [writer for writer in header.get('writers', []) if writer.get('expires', now) > now]
+            if writers and not force:
+                if not wait_for_writers:
+                    break
+                time.sleep(0.05 * (attempt + 1))
+                continue
+
+            # Stale from here until the final compare-and-set succeeds
+            version = header.get('version', 0)
+            result = self.collection.update_one(
+                {**header_filter, 'version': version},
+                {'$set': {'ready': False}, '$inc': {'version': 1}}
+            )
+            if not result.matched_count:
+                time.sleep(0.05 * (attempt + 1))
+                continue
+            version += 1
+
+            existing = {
+                doc['member']: doc.get('version', 0)
+                for doc in self.collection.find(
+                    {'group_id': scope, 'member': {'$ne': None}},
+                    {'_id': 0, 'member': 1, 'version': 1}
+                )
+            }
+
+            balances = self._fold(query)
+
+            operations = []
+            for member in set(existing) | set(balances):
+                if member in existing:
+                    operations.append(UpdateOne(
+                        {'group_id': scope, 'member': member, 'version': existing[member]},
+                        {'$set': {'balance_paisa': balances.get(member, 0)}, '$inc': {'version': 1}}
+                    ))
+                else:
+                    # Only insert: if a writer created the member meanwhile this
+                    # hits the unique index and counts as a conflict
+                    operations.append(UpdateOne(
+                        {'group_id': scope, 'member': member, 'version': {'$exists': False}},
+                        {'$set': {'balance_paisa': balances[member], 'version': 1}},
+                        upsert=True
+                    ))
+
+            conflict = False
+            if operations:
+                try:
+                    result = self.collection.bulk_write(operations, ordered=False)
+                    conflict = result.matched_count + result.upserted_count < len(operations)
+                except BulkWriteError:
+                    conflict = True
+
+            header_update = {
+                '$set': {'ready': True, 'rebuilt_at': datetime.utcnow()},
+                '$inc': {'version': 1}
+            }
+            if force:
+                header_update['$set']['writers'] = []
+            else:
+                # Leases of writers that died before committing
+                header_update['$pull'] = {'writers': {'expires': {'$lte': now}}}
+
+            if not conflict:
+                result = self.collection.update_one(
+                    {**header_filter, 'version': version},
+                    header_update
+                )
+                if result.matched_count:
+                    logger.info('Balance ledger rebuilt for scope %s (%d members)', scope, len(balances))
+                    return balances
+
+            time.sleep(0.05 * (attempt + 1))
+
+        raise LedgerBusy(f'Balance ledger rebuild for scope {scope} kept conflicting with writers')
+
+    def rebuild_all(self, clear_pending=False):
+        """Rebuild every group scope plus the all-groups scope. Returns scope count."""
+        scopes = set(self.db.expenses.distinct('group_id'))
+        scopes.update(self.db.settlements.distinct('group_id'))
+        scopes.update(self.collection.distinct('group_id'))
+        scopes.discard(None)
+        scopes.add(ALL_GROUPS)
+
+        for scope in scopes:
+            self.rebuild(scope, clear_pending=clear_pending)
+        return len(scopes)
+
+    def drop_group(self, group_id):
+        """
+        Remove a deleted group's scope. Call after its expenses and settlements
+        are gone; the all-groups scope is rebuilt on its next read.
+        """
+        self.collection.delete_many({'group_id': group_id})
+        self.invalidate(None)
@@ -1,16 +1,28 @@
 from bson import ObjectId
 from datetime import datetime
-from app.utils.money import rupees_to_paisa, paisa_to_rupees, split_equally, validate_amount_paisa
+from pymongo.errors import BulkWriteError
+from app.utils.money import rupees_to_paisa, paisa_to_rupees, split_equally, split_equally_batch, validate_amount_paisa
+from app.utils.debt_optimizer import calculate_net_balances
+from app.models.balance import Balance
+from app.models.group import Group
+from app.utils.pagination import paginate
+from app.utils.projection import read_collection
+
+# Keyset pagination order (newest first)
+EXPENSE_SORT = [('date', -1), ('_id', -1)]
+
+# Documents per insert_many round trip for bulk ingestion
+BULK_CHUNK_SIZE = 500
+
+# Fields list responses may return (narrowed with ?fields=)
+EXPENSE_LIST_FIELDS = ('description', 'amount', 'amount_paisa', 'payer', 'participants',
+                       'participant_shares', 'date', 'currency', 'group_id')
 
 class Expense:
     def __init__(self, db):
         self.collection = db.expenses
-        try:
-            self.collection.create_index("date")
-            self.collection.create_index("payer")
-            self.collection.create_index("participants")
-        except Exception:
-            pass
+        self.balances = Balance(db)
+        self.groups = Group(db)
     
     def _validate_amount(self, amount):
         """Validate and convert amount to paisa (integer)"""
@@ -37,24 +49,58 @@ class Expense:
         
         return list(set(participants))  # Remove duplicates
     
-    def create_expense(self, description, amount, payer, participants, group_id=None):
-        """Create expense with integer paisa storage"""
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        logger.info(f'Creating expense: {description}, amount: {amount}, payer: {payer}')
-        
+    def build_expense(self, description, amount, payer, participants, group_id=None):
+        """Validate inputs and build the expense document (not inserted)"""
         # Validate and convert amount to paisa
         amount_paisa = self._validate_amount(amount)
-        logger.info(f'Amount in paisa: {amount_paisa}')
         
         # Validate participants
         validated_participants = self._validate_participants(participants, payer)
-        logger.info(f'Validated participants: {validated_participants}')
         
         # Calculate shares in paisa
         shares_paisa = split_equally(amount_paisa, len(validated_participants))
         
+        return self._expense_document(description, amount_paisa, payer, validated_participants,
+                                      shares_paisa, group_id)
+    
+    def build_expenses_batch(self, rows, amounts_paisa):
+        """
+        build_expense for many rows at once.
+        
+        `rows` are field dicts as passed to build_expense whose amounts were
+        already converted and validated with rupees_to_paisa_batch;
+        `amounts_paisa` holds the matching paisa values. All shares are split
+        in one split_equally_batch call. Returns (documents, errors), both
+        keyed by position in rows.
+        """
+        documents = {}
+        errors = {}
+        positions = []
+        participants_lists = []
+        for position, fields in enumerate(rows):
+            try:
+                participants_lists.append(self._validate_participants(fields['participants'], fields['payer']))
+                positions.append(position)
+            except ValueError as e:
+                errors[position] = str(e)
+        
+        shares, offsets = split_equally_batch(
+            [amounts_paisa[position] for position in positions],
+            [len(participants) for participants in participants_lists]
+        )
+        shares = shares.tolist()
+        offsets = offsets.tolist()
+        
+        for i, position in enumerate(positions):
+            fields = rows[position]
+            documents[position] = self._expense_document(
+                fields['description'], int(amounts_paisa[position]), fields['payer'], participants_lists[i],
+                shares[offsets[i]:offsets[i + 1]], fields.get('group_id')
+            )
+        return documents, errors
+    
+    def _expense_document(self, description, amount_paisa, payer, validated_participants, shares_paisa,
+                          group_id=None):
         # Create participant shares
         participant_shares = []
         for i, participant in enumerate(validated_participants):
@@ -78,23 +124,116 @@ class Expense:
         if group_id:
             expense_data['group_id'] = group_id
         
-        logger.info(f'Inserting expense with amount_paisa: {amount_paisa}')
+        return expense_data
+    
+    def create_expense(self, description, amount, payer, participants, group_id=None):
+        """Create expense with integer paisa storage"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        expense_data = self.build_expense(description, amount, payer, participants, group_id)
         
         try:
-            result = self.collection.insert_one(expense_data)
-            logger.info(f'Expense created with ID: {result.inserted_id}')
+            result = self.balances.record(
+                group_id,
+                lambda: self.collection.insert_one(expense_data),
+                calculate_net_balances([expense_data], [])
+            )
+            logger.debug('Expense %s created: %s paisa paid by %s for %d participants',
+                         result.inserted_id, expense_data['amount_paisa'], payer, len(expense_data['participants']))
             return result.inserted_id
         except Exception as e:
-            logger.error(f'MongoDB insert failed: {e}')
+            logger.error('MongoDB insert failed: %s', e)
             raise
     
-    def get_all_expenses(self, group_id=None):
+    def insert_expenses_bulk(self, expenses, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Insert pre-built expense documents with unordered insert_many chunks.
+        
+        The balance ledger is updated once per chunk (per group) rather than
+        once per expense. Returns (inserted, errors): inserted maps the input
+        index to the new ObjectId, errors maps the input index to a message.
+        
+        Never raises for a failed chunk: chunks committed before it stay in
+        `inserted`, its own rows are reported with an unknown outcome and the
+        rows after it as not inserted.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        inserted = {}
+        errors = {}
+        aborted = None
+        
+        # Group rows so every chunk touches a single ledger scope
+        by_group = {}
+        for index, expense in enumerate(expenses):
+            by_group.setdefault(expense.get('group_id'), []).append(index)
+        
+        for group_id, indexes in by_group.items():
+            for start in range(0, len(indexes), chunk_size):
+                chunk = indexes[start:start + chunk_size]
+                if aborted:
+                    for index in chunk:
+                        errors[index] = f'Not inserted: {aborted}'
+                    continue
+                documents = [expenses[i] for i in chunk]
+                
+                def write():
+                    failed = {}
+                    try:
+                        self.collection.insert_many(documents, ordered=False)
+                    except BulkWriteError as e:
+                        for error in e.details.get('writeErrors', []):
+                            failed[error['index']] = error.get('errmsg', 'Insert failed')
+                    return failed
+                
+                def deltas(failed):
+                    written = [doc for i, doc in enumerate(documents) if i not in failed]
+                    return calculate_net_balances(written, [])
+                
+                try:
+                    failed = self.balances.record(group_id, write, deltas)
+                except Exception as e:
+                    # Part of the chunk may be stored; later chunks are skipped
+                    logger.error('Bulk insert chunk for group %s failed: %s', group_id, e)
+                    aborted = 'an earlier chunk failed'
+                    failed = {position: f'Insert outcome unknown: {e}' for position in range(len(chunk))}
+                
+                for position, index in enumerate(chunk):
+                    if position in failed:
+                        errors[index] = failed[position]
+                    else:
+                        inserted[index] = documents[position]['_id']
+        
+        return inserted, errors
+    
+    def get_all_expenses(self, group_id=None, projection=None, raw=False):
         """Get all expenses sorted by date (newest first)"""
-        query = {'group_id': group_id} if group_id else {}
-        return list(self.collection.find(query).sort('date', -1))
+        query = self.groups.live_query(group_id)
+        if query is None:
+            return []
+        return list(read_collection(self.collection, raw).find(query, projection).sort('date', -1))
+    
+    def get_expenses_page(self, group_id=None, limit=50, cursor=None, projection=None, raw=False):
+        """Get one page of expenses (newest first). Returns (expenses, next_cursor)"""
+        query = self.groups.live_query(group_id)
+        if query is None:
+            return [], None
+        return paginate(read_collection(self.collection, raw), query, EXPENSE_SORT, limit, cursor, projection)
     
-    def get_expenses_by_participant(self, participant_name):
-        """Get expenses where a specific person participated"""
-        return list(self.collection.find({
-            'participants': participant_name
-        }).sort('date', -1))
\ No newline at end of file
+    def get_expenses_by_participant(self, group_id, participant_name, limit=50, cursor=None):
+        """
+        One page of a group's expenses that participant_name shares in (the
+        payer is always a participant), newest first, with participant_shares
+        narrowed to their entry. Returns (documents, next_cursor).
+        """
+        return paginate(
+            self.collection,
+            {'group_id': group_id, 'participants': participant_name},
+            EXPENSE_SORT, limit, cursor,
+            projection={
+                'description': 1, 'date': 1, 'payer': 1, 'amount_paisa': 1,
+                'participant_shares': {'$elemMatch': {'name': participant_name}}
+            }
+        )
\ No newline at end of file
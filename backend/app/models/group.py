@@ -1,22 +1,39 @@
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
 import secrets
+from app.utils.pagination import paginate
+from app.utils.projection import read_collection
+
+# Attempts at a fresh random code before giving up (16^6 codes)
+CODE_ATTEMPTS = 10
+
+# Collections holding a group's data, removed by the reaper after deletion
+GROUP_DATA_COLLECTIONS = ('expenses', 'settlements', 'friends')
+
+# A write that passed the live-group check just before DELETE can land this
+# long after the tombstone (no request outlives gunicorn's 120s timeout), so
+# the tombstone is only purged after a final sweep once it has passed
+PURGE_GRACE_SECONDS = 150
+
+# Groups that are deleted but not yet reaped
+DELETED = {'deleted_at': {'$exists': True}}
+LIVE = {'deleted_at': {'$exists': False}}
+
+# Keyset pagination order (newest first)
+GROUP_SORT = [('created_at', -1), ('_id', -1)]
+
+# Fields list responses may return (narrowed with ?fields=)
+GROUP_LIST_FIELDS = ('name', 'group_code', 'created_at')
 
 class Group:
     def __init__(self, db):
+        self.db = db
         self.collection = db.groups
-        try:
-            self.collection.create_index("group_code", unique=True)
-            self.collection.create_index("created_at")
-        except Exception:
-            pass
     
     def _generate_group_code(self):
-        """Generate unique 6-character group code"""
-        while True:
-            code = secrets.token_hex(3).upper()  # 6 chars
-            if not self.collection.find_one({'group_code': code}):
-                return code
+        """Generate a random 6-character group code"""
+        return secrets.token_hex(3).upper()
     
     def create_group(self, name):
         """Create new group"""
@@ -26,30 +43,128 @@ class Group:
         if len(name) > 50:
             raise ValueError("Group name too long (max 50 characters)")
         
-        group_code = self._generate_group_code()
-        
         group_data = {
             'name': name.strip(),
-            'group_code': group_code,
+            'group_code': None,
             'created_at': datetime.utcnow()
         }
         
-        result = self.collection.insert_one(group_data)
-        return result.inserted_id, group_code
+        # The unique group_code index rejects a taken code; draw another
+        for _ in range(CODE_ATTEMPTS):
+            group_data['group_code'] = self._generate_group_code()
+            try:
+                result = self.collection.insert_one(group_data)
+                return result.inserted_id, group_data['group_code']
+            except DuplicateKeyError:
+                continue
+        raise RuntimeError('Could not allocate a unique group code')
     
-    def get_group_by_code(self, group_code):
+    def get_group_by_code(self, group_code, projection=None):
         """Get group by code"""
-        return self.collection.find_one({'group_code': group_code.upper()})
+        return self.collection.find_one({'group_code': group_code.upper(), **LIVE}, projection)
     
     def get_group_by_id(self, group_id):
         """Get group by ID"""
-        return self.collection.find_one({'_id': ObjectId(group_id)})
+        return self.collection.find_one({'_id': ObjectId(group_id), **LIVE})
     
-    def get_all_groups(self):
+    def get_all_groups(self, projection=None, raw=False):
         """Get all groups"""
-        return list(self.collection.find({}).sort('created_at', -1))
+        return list(read_collection(self.collection, raw).find(LIVE, projection).sort('created_at', -1))
+    
+    def get_groups_page(self, limit=50, cursor=None, projection=None, raw=False):
+        """Get one page of groups (newest first). Returns (groups, next_cursor)"""
+        return paginate(read_collection(self.collection, raw), LIVE, GROUP_SORT, limit, cursor, projection)
+    
+    def live_among(self, group_ids):
+        """The ids in group_ids that name an existing group that is not deleted"""
+        ids = [ObjectId(group_id) for group_id in group_ids if isinstance(group_id, str) and ObjectId.is_valid(group_id)]
+        if not ids:
+            return set()
+        return {str(doc['_id']) for doc in self.collection.find({'_id': {'$in': ids}, **LIVE}, {'_id': 1})}
+    
+    def is_live(self, group_id):
+        """True if group_id can take writes (data written to any other id would be orphaned)"""
+        return group_id in self.live_among([group_id])
+    
+    def is_deleted(self, group_id):
+        """True while group_id is tombstoned"""
+        if not isinstance(group_id, str) or not ObjectId.is_valid(group_id):
+            return False
+        return self.collection.find_one({'_id': ObjectId(group_id), **DELETED}, {'_id': 1}) is not None
+    
+    def live_query(self, group_id=None):
+        """
+        Filter for expenses/settlements/friends that leaves out the data of
+        deleted groups still waiting for the reaper. Returns None when
+        group_id itself is deleted.
+        
+        With a group_id this is a single _id lookup; only the all-groups
+        filter lists the tombstones (the reaper's backlog, via the sparse
+        deleted_at index).
+        """
+        if group_id:
+            return None if self.is_deleted(group_id) else {'group_id': group_id}
+        deleted = [str(doc['_id']) for doc in self.collection.find(DELETED, {'_id': 1})]
+        return {'group_id': {'$nin': deleted}} if deleted else {}
     
     def delete_group(self, group_id):
-        """Delete group"""
-        result = self.collection.delete_one({'_id': ObjectId(group_id)})
+        """Tombstone a group; its data is removed later by reap_group_data()"""
+        result = self.collection.update_one(
+            {'_id': ObjectId(group_id), **LIVE},
+            {'$set': {
+                'deleted_at': datetime.utcnow(),
+                'reaped': {name: 0 for name in GROUP_DATA_COLLECTIONS}
+            }}
+        )
+        return result.matched_count > 0
+    
+    def claim_deleted_group(self, lease_seconds):
+        """
+        Lease the oldest deleted group no other reaper is working on.
+        Returns its _id, or None when there is nothing to reap.
+        """
+        now = datetime.utcnow()
+        doc = self.collection.find_one_and_update(
+            {**DELETED, '$or': [{'reaper_lease': {'$exists': False}}, {'reaper_lease': {'$lt': now}}]},
+            {'$set': {'reaper_lease': now + timedelta(seconds=lease_seconds)}},
+            projection={'_id': 1},
+            sort=[('deleted_at', 1)]
+        )
+        return doc['_id'] if doc else None
+    
+    def reap_group_data(self, group_id, batch_size, lease_seconds):
+        """
+        Delete a deleted group's expenses, settlements and friends in batches
+        of batch_size, recording progress (and renewing the lease) on the group
+        document after every batch. Safe to resume after a crash.
+        """
+        for name in GROUP_DATA_COLLECTIONS:
+            collection = self.db[name]
+            while True:
+                ids = [doc['_id'] for doc in collection.find({'group_id': str(group_id)}, {'_id': 1}).limit(batch_size)]
+                if not ids:
+                    break
+                deleted = collection.delete_many({'_id': {'$in': ids}}).deleted_count
+                self.collection.update_one(
+                    {'_id': group_id},
+                    {
+                        '$inc': {f'reaped.{name}': deleted},
+                        '$set': {'reaper_lease': datetime.utcnow() + timedelta(seconds=lease_seconds)}
+                    }
+                )
+    
+    def defer_purge(self, group_id):
+        """Lease the tombstone until its purge grace has passed"""
+        self.collection.update_one(
+            {'_id': group_id},
+            {'$set': {'reaper_lease': datetime.utcnow() + timedelta(seconds=PURGE_GRACE_SECONDS)}}
+        )
+    
+    def purge_group(self, group_id):
+        """
+        Remove the tombstone once its data is gone and PURGE_GRACE_SECONDS
+        have passed since the delete. Returns False if it is too early.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=PURGE_GRACE_SECONDS)
+        result = self.collection.delete_one({'_id': group_id, **DELETED, 'deleted_at': {'$lte': cutoff}})
         return result.deleted_count > 0
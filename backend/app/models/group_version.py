@@ -0,0 +1,36 @@
+"""
+Per-group change counter.
+
+Every write that changes what a group's GET routes return bumps the group's
+version (and the all-groups version used by unscoped requests). Reads turn it
+into an ETag so unchanged polls can be answered without querying the data.
+"""
+from datetime import datetime
+from pymongo import UpdateOne
+
+# Version key shared by every write (used when no group_id is given)
+ALL_GROUPS = '*'
+
+
+class GroupVersion:
+    def __init__(self, db):
+        self.collection = db.group_versions
+
+    def bump(self, group_id):
+        """Record a change to group_id (None = ungrouped data)"""
+        scopes = [group_id, ALL_GROUPS] if group_id else [ALL_GROUPS]
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne({'_id': scope}, {'$inc': {'version': 1}, '$set': {'updated_at': now}}, upsert=True)
+            for scope in scopes
+        ], ordered=False)
+
+    def get(self, group_id=None):
+        """Current version of group_id, or of all data when group_id is None"""
+        doc = self.collection.find_one({'_id': group_id or ALL_GROUPS}, {'version': 1})
+        return doc.get('version', 0) if doc else 0
+    
+    def recently_changed(self, limit):
+        """Ids of the `limit` most recently written groups"""
+        cursor = self.collection.find({'_id': {'$ne': ALL_GROUPS}}, {'_id': 1}).sort('updated_at', -1).limit(limit)
+        return [doc['_id'] for doc in cursor]
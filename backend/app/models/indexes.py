@@ -0,0 +1,202 @@
+"""
+Index declarations and reconciliation.
+
+Every index the routes rely on is declared here and created once per worker
+during warmup (or with `flask ensure-indexes`) instead of from model
+constructors on every request. find_collscans() explains the route queries
+and reports any that would fall back to a collection scan.
+"""
+import logging
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    'expenses': [
+        IndexModel([('group_id', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)], name='group_date'),
+        IndexModel([('date', DESCENDING), ('_id', DESCENDING)], name='date'),
+        # Member history (multikey on participants)
+        IndexModel([('group_id', ASCENDING), ('participants', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='group_participant_date'),
+    ],
+    'settlements': [
+        IndexModel([('group_id', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)], name='group_date'),
+        IndexModel([('date', DESCENDING), ('_id', DESCENDING)], name='date'),
+        # Member history: one index per $or branch
+        IndexModel([('group_id', ASCENDING), ('fromUser', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='group_from_date'),
+        IndexModel([('group_id', ASCENDING), ('toUser', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='group_to_date'),
+    ],
+    'friends': [
+        IndexModel([('group_id', ASCENDING), ('name', ASCENDING), ('_id', ASCENDING)], name='group_name'),
+        IndexModel([('name', ASCENDING), ('_id', ASCENDING)], name='name'),
+        # Unique: add_friend inserts and relies on DuplicateKeyError
+        IndexModel([('group_id', ASCENDING), ('email', ASCENDING)], name='group_email', unique=True),
+    ],
+    'groups': [
+        IndexModel([('group_code', ASCENDING)], name='group_code', unique=True),
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at'),
+        # Only tombstoned groups carry deleted_at
+        IndexModel([('deleted_at', ASCENDING)], name='deleted_at', sparse=True),
+    ],
+    'balances': [
+        IndexModel([('group_id', ASCENDING), ('member', ASCENDING)], name='group_member', unique=True),
+    ],
+}
+
+# Representative query shape of every route read: (name, collection, filter, sort)
+ROUTE_QUERIES = [
+    ('expenses by group', 'expenses', {'group_id': 'x'}, [('date', -1)]),
+    ('expenses page', 'expenses', {'group_id': 'x'}, [('date', -1), ('_id', -1)]),
+    ('all expenses', 'expenses', {}, [('date', -1)]),
+    ('settlements by group', 'settlements', {'group_id': 'x'}, [('date', -1)]),
+    ('settlements page', 'settlements', {'group_id': 'x'}, [('date', -1), ('_id', -1)]),
+    ('all settlements', 'settlements', {}, [('date', -1)]),
+    ('member expenses', 'expenses', {'group_id': 'x', 'participants': 'A'}, [('date', -1), ('_id', -1)]),
+    ('member settlements', 'settlements', {'group_id': 'x', '$or': [{'fromUser': 'A'}, {'toUser': 'A'}]},
+     [('date', -1), ('_id', -1)]),
+    ('friends by group', 'friends', {'group_id': 'x'}, [('name', 1)]),
+    ('all friends', 'friends', {}, [('name', 1)]),
+    ('friend lookup', 'friends', {'group_id': 'x', 'email': 'a@b.co'}, None),
+    ('group by code', 'groups', {'group_code': 'ABC123'}, None),
+    ('all groups', 'groups', {}, [('created_at', -1)]),
+    ('deleted groups', 'groups', {'deleted_at': {'$exists': True}}, [('deleted_at', 1)]),
+    ('group balances', 'balances', {'group_id': 'x'}, None),
+]
+
+
+def _spec(index):
+    """Comparable (key, unique) pair from an IndexModel document or index_information() entry"""
+    key = index.get('key')
+    if isinstance(key, dict):
+        key = key.items()
+    return tuple((field, int(direction)) for field, direction in key), bool(index.get('unique', False))
+
+
+def ensure_indexes(db, prune=False, dedupe=False):
+    """
+    Create missing declared indexes. Existing indexes are matched on their
+    key pattern, whatever they are named. With prune=True, indexes that are
+    not declared are dropped and indexes whose options differ from their
+    declaration are rebuilt. With dedupe=True, documents that would violate a
+    unique index about to be built are removed first (remove_duplicates).
+    Every collection and index is handled on its own, so one failure (e.g. a
+    unique build over duplicate data) does not stop the rest.
+    Returns {'created', 'dropped', 'deduplicated', 'conflicts', 'failed'} lists.
+    """
+    report = {'created': [], 'dropped': [], 'deduplicated': [], 'conflicts': [], 'failed': []}
+
+    for collection_name, models in INDEXES.items():
+        try:
+            _reconcile(db[collection_name], models, prune, dedupe, report)
+        except Exception as e:
+            report['failed'].append(f'{collection_name}: {e}')
+
+    if report['conflicts']:
+        logger.warning('Index options differ from declarations: %s', report['conflicts'])
+    if report['failed']:
+        logger.error('Index reconciliation failed: %s', report['failed'])
+    return report
+
+
+def _reconcile(collection, models, prune, dedupe, report):
+    collection_name = collection.name
+    existing = {}
+    for name, info in collection.index_information().items():
+        key, unique = _spec(info)
+        existing[key] = (name, unique)
+
+    declared = set()
+    missing = []
+    for model in models:
+        document = model.document
+        key, unique = _spec(document)
+        declared.add(key)
+        if key not in existing:
+            missing.append(model)
+        elif existing[key][1] != unique:
+            if prune:
+                collection.drop_index(existing[key][0])
+                report['dropped'].append(f'{collection_name}.{existing[key][0]}')
+                missing.append(model)
+            else:
+                # Same key, different options: needs a manual decision
+                report['conflicts'].append(f'{collection_name}.{existing[key][0]}')
+                if unique:
+                    logger.error(
+                        f'{collection_name}.{existing[key][0]} is declared unique but is not unique in the '
+                        f'database, so duplicates are accepted. Run `flask ensure-indexes --dedupe --prune`.'
+                    )
+
+    # One at a time, so a failed build does not hold back the others
+    for model in missing:
+        name = f'{collection_name}.{model.document["name"]}'
+        try:
+            if dedupe and model.document.get('unique'):
+                removed = remove_duplicates(collection, model)
+                if removed:
+                    report['deduplicated'].append(f'{name}: {removed} removed')
+            collection.create_indexes([model])
+            report['created'].append(name)
+        except Exception as e:
+            report['failed'].append(f'{name}: {e}')
+
+    if prune:
+        for key, (name, _) in existing.items():
+            if name != '_id_' and key not in declared:
+                collection.drop_index(name)
+                report['dropped'].append(f'{collection_name}.{name}')
+
+
+def remove_duplicates(collection, model):
+    """
+    Delete documents that would violate a unique index: for every duplicated
+    key only the oldest document (lowest _id) is kept. Bumps the version of
+    each affected group so cached responses are revalidated. Returns the
+    number of documents removed.
+    """
+    from app.models.group_version import GroupVersion
+
+    fields = list(model.document['key'].keys())
+    duplicates = collection.aggregate([
+        {'$group': {'_id': {field.replace('.', '_'): f'${field}' for field in fields},
+                    'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ], allowDiskUse=True)
+
+    removed = 0
+    groups = set()
+    for duplicate in duplicates:
+        extra = sorted(duplicate['ids'])[1:]
+        removed += collection.delete_many({'_id': {'$in': extra}}).deleted_count
+        groups.add(duplicate['_id'].get('group_id'))
+        logger.warning('Removed %d duplicate %s documents for %s', len(extra), collection.name, duplicate['_id'])
+
+    versions = GroupVersion(collection.database)
+    for group_id in groups:
+        versions.bump(group_id)
+    return removed
+
+
+def _has_collscan(plan):
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(value) for value in plan)
+    return False
+
+
+def find_collscans(db):
+    """Names of route queries whose winning plan contains a COLLSCAN"""
+    offenders = []
+    for name, collection_name, query, sort in ROUTE_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        if _has_collscan(plan):
+            offenders.append(name)
+    return offenders
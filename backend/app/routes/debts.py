@@ -1,31 +1,75 @@
 from flask import Blueprint, request, jsonify, current_app
 from bson import ObjectId
 from app.utils.money import paisa_to_rupees
-from app.utils.debt_optimizer import calculate_optimized_debts
+from app.utils.debt_optimizer import calculate_net_balances, optimize_settlements, optimize_settlements_exact
+from app.utils.balance_pipeline import aggregate_net_balances, aggregate_pairwise_debts
+from app.models.balance import Balance, EXPENSE_FIELDS, SETTLEMENT_FIELDS
+from app.models.group import Group
+from app.utils.etag import group_etag, not_modified, with_etag
 
 debts_bp = Blueprint('debts', __name__)
 
+# Balance engines selectable with ?engine=
+BALANCE_ENGINES = ('ledger', 'aggregate', 'python')
+
+
+def load_balances(group_id, query, engine):
+    """Net balances (paisa) per member using the requested engine"""
+    db = current_app.db
+    if query is None:
+        # Deleted group waiting for the reaper
+        return {}
+    if engine == 'aggregate':
+        # Fold inside MongoDB, only {member, balance_paisa} rows cross the wire
+        return aggregate_net_balances(db, query)
+    if engine == 'python':
+        # Refold the full history in Python
+        return calculate_net_balances(
+            db.expenses.find(query, EXPENSE_FIELDS),
+            db.settlements.find(query, SETTLEMENT_FIELDS)
+        )
+    # Read from the materialized ledger (O(members))
+    return Balance(db).get_balances(group_id)
+
+
 @debts_bp.route('/debts', methods=['GET'])
 def get_debts():
     group_id = request.args.get('group_id')  # Optional filter
-    optimize = request.args.get('optimize', 'true').lower() == 'true'  # Default: optimized
+    optimize_mode = request.args.get('optimize', 'true').lower()  # Default: optimized
+    optimize = optimize_mode in ('true', 'exact')  # 'exact' = true minimum number of transfers
+    engine = request.args.get('engine', 'ledger').lower()
+    
+    if engine not in BALANCE_ENGINES:
+        return jsonify({'error': f'Unknown engine (expected one of: {", ".join(BALANCE_ENGINES)})'}), 400
     
     try:
         if current_app.db is None:
             return jsonify({'error': 'Database not available'}), 503
             
-        expenses_collection = current_app.db.expenses
-        settlements_collection = current_app.db.settlements
+        # Answer unchanged polls before touching the data collections
+        etag = group_etag(group_id)
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        # Build query for group filtering
-        query = {'group_id': group_id} if group_id else {}
+        # Serve repeated loads of an unchanged group from memory
+        cache_key = (group_id, optimize_mode if optimize else 'false', engine)
+        body = current_app.debts_cache.get(cache_key, etag)
+        if body is not None:
+            response = current_app.response_class(body, mimetype='application/json')
+            return with_etag(response, etag), 200
         
-        expenses = list(expenses_collection.find(query))
-        settlements = list(settlements_collection.find(query))
+        # Build query for group filtering (None for a deleted group)
+        query = Group(current_app.db).live_query(group_id)
         
         if optimize:
-            # Use optimized algorithm
-            optimized_settlements, balances = calculate_optimized_debts(expenses, settlements)
+            balances = load_balances(group_id, query, engine)
+            if optimize_mode == 'exact':
+                optimized_settlements = optimize_settlements_exact(
+                    balances, time_budget=current_app.config['EXACT_SOLVER_BUDGET']
+                )
+            else:
+                optimized_settlements = optimize_settlements(balances)
             
             # Convert to response format
             debts = []
@@ -41,82 +85,43 @@ def get_debts():
             for person, balance_paisa in balances.items():
                 balance_summary[person] = paisa_to_rupees(balance_paisa)
             
-            return jsonify({
+            response = jsonify({
                 'debts': debts,
                 'balances': balance_summary,
                 'optimized': True
-            }), 200
+            })
+            current_app.debts_cache.set(cache_key, response.get_data(), etag)
+            return with_etag(response, etag), 200
         else:
             # Legacy pairwise debt calculation
-            return get_debts_legacy(query)
+            response, status = get_debts_legacy(query)
+            if status == 200:
+                current_app.debts_cache.set(cache_key, response.get_data(), etag)
+                with_etag(response, etag)
+            return response, status
         
     except Exception as e:
-        current_app.logger.error(f'Get debts error: {e}')
+        current_app.logger.error('Get debts error: %s', e)
         return jsonify({'error': 'Failed to calculate debts'}), 500
 
 
 def get_debts_legacy(query):
     """Legacy debt calculation (pairwise)"""
     try:
-        friends_collection = current_app.db.friends
-        expenses_collection = current_app.db.expenses
-        settlements_collection = current_app.db.settlements
-        
-        friends = list(friends_collection.find(query))
-        expenses = list(expenses_collection.find(query))
-        settlements = list(settlements_collection.find(query))
-        
-        # Calculate debts using integer paisa
-        debt_matrix_paisa = {}
-        
-        # Initialize debt matrix (in paisa)
-        for friend in friends:
-            friend_name = friend['name']
-            debt_matrix_paisa[friend_name] = {}
-            for other_friend in friends:
-                if friend_name != other_friend['name']:
-                    debt_matrix_paisa[friend_name][other_friend['name']] = 0
-        
-        # Process expenses
-        for expense in expenses:
-            payer = expense.get('payer')
-            participant_shares = expense.get('participant_shares', [])
-            
-            if payer and participant_shares:
-                # Use exact shares from expense
-                for share in participant_shares:
-                    participant = share['name']
-                    share_paisa = share['share_paisa']
-                    
-                    if participant != payer and participant in debt_matrix_paisa:
-                        if payer in debt_matrix_paisa[participant]:
-                            debt_matrix_paisa[participant][payer] += share_paisa
-        
-        # Process settlements (subtract payments in paisa)
-        for settlement in settlements:
-            from_user = settlement.get('fromUser')
-            to_user = settlement.get('toUser')
-            amount_paisa = settlement.get('amount_paisa', 0)
-            
-            if from_user and to_user and amount_paisa > 0:
-                if from_user in debt_matrix_paisa and to_user in debt_matrix_paisa[from_user]:
-                    debt_matrix_paisa[from_user][to_user] -= amount_paisa
-                    if debt_matrix_paisa[from_user][to_user] < 0:
-                        debt_matrix_paisa[from_user][to_user] = 0
+        # Sparse pairwise ledger computed in MongoDB (only pairs that transacted)
+        debt_pairs_paisa = aggregate_pairwise_debts(current_app.db, query) if query is not None else {}
         
         # Convert to response format (rupees)
         debts = []
-        for debtor, creditors in debt_matrix_paisa.items():
-            for creditor, amount_paisa in creditors.items():
-                if amount_paisa > 0:  # Any positive debt
-                    debts.append({
-                        'debtor': debtor,
-                        'creditor': creditor,
-                        'amount': paisa_to_rupees(amount_paisa)
-                    })
+        for (debtor, creditor), amount_paisa in sorted(debt_pairs_paisa.items()):
+            debts.append({
+                'debtor': debtor,
+                'creditor': creditor,
+                'amount': paisa_to_rupees(amount_paisa)
+            })
         
         return jsonify(debts), 200
         
     except Exception as e:
-        current_app.logger.error(f'Get debts legacy error: {e}')
-        return jsonify({'error': 'Failed to calculate debts'}), 500
\ No newline at end of file
+        current_app.logger.error('Get debts legacy error: %s', e)
+        return jsonify({'error': 'Failed to calculate debts'}), 500
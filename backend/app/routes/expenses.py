@@ -1,46 +1,93 @@
 from flask import Blueprint, request, jsonify, current_app
-from app.models.expense import Expense
+from app.models.expense import Expense, EXPENSE_LIST_FIELDS
+from app.models.group import Group
 from app.utils.sanitize import sanitize_string, sanitize_amount, sanitize_list
+from app.utils.pagination import wants_page, parse_limit
+from app.utils.etag import group_etag, not_modified, with_etag, record_change
+from app.utils.projection import list_projection
+from app.utils.money import rupees_to_paisa_batch, AMOUNT_OK, AMOUNT_INVALID
 from bson import ObjectId
+import json
 
 expenses_bp = Blueprint('expenses', __name__)
 
-@expenses_bp.route('/expenses', methods=['POST'])
-def create_expense():
-    current_app.logger.info('Creating new expense')
-    data = request.get_json()
+# Maximum rows accepted by one bulk request
+MAX_BULK_ROWS = 10000
+
+
+def parse_expense(data, amount_valid=None):
+    """
+    Sanitize and validate one expense payload.
+    Returns (fields, None) on success or (None, error message).
     
-    if not data:
-        return jsonify({'success': False, 'error': 'Request body is required'}), 400
+    Bulk callers that already checked the amounts with rupees_to_paisa_batch
+    pass amount_valid instead of having the amount sanitized again here.
+    """
+    if not isinstance(data, dict):
+        return None, 'Expense must be a JSON object'
     
     # Sanitize inputs
     description = sanitize_string(data.get('description', ''), max_length=200)
-    amount = sanitize_amount(data.get('amount'))
+    if amount_valid is None:
+        amount = sanitize_amount(data.get('amount'))
+        amount_valid = amount is not None
+    else:
+        amount = data.get('amount')
     payer = sanitize_string(data.get('payer', ''), max_length=100)
     participants = sanitize_list(data.get('participants', []), max_items=50)
     group_id = sanitize_string(data.get('group_id', ''), max_length=50) if data.get('group_id') else None
     
     # Validation
     if not description:
-        return jsonify({'success': False, 'error': 'Description is required'}), 400
+        return None, 'Description is required'
     
-    if amount is None:
-        return jsonify({'success': False, 'error': 'Valid amount is required (max 1 crore)'}), 400
+    if not amount_valid:
+        return None, 'Valid amount is required (max 1 crore)'
     
     if not payer:
-        return jsonify({'success': False, 'error': 'Payer is required'}), 400
+        return None, 'Payer is required'
     
     if not participants or len(participants) == 0:
-        return jsonify({'success': False, 'error': 'At least one participant is required'}), 400
+        return None, 'At least one participant is required'
     
     # Sanitize participant names
     participants = [sanitize_string(p, max_length=100) for p in participants if p]
     
+    return {
+        'description': description,
+        'amount': amount,
+        'payer': payer,
+        'participants': participants,
+        'group_id': group_id
+    }, None
+
+
+@expenses_bp.route('/expenses', methods=['POST'])
+def create_expense():
+    current_app.logger.debug('Creating new expense')
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'success': False, 'error': 'Request body is required'}), 400
+    
+    fields, error = parse_expense(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    description = fields['description']
+    amount = fields['amount']
+    payer = fields['payer']
+    participants = fields['participants']
+    group_id = fields['group_id']
+    
     try:
         if current_app.db is None:
             current_app.logger.error('Database connection not available')
             return jsonify({'success': False, 'error': 'Database not available'}), 503
             
+        if group_id and not Group(current_app.db).is_live(group_id):
+            return jsonify({'success': False, 'error': 'Group not found'}), 404
+        
         expense_model = Expense(current_app.db)
         expense_id = expense_model.create_expense(
             description=description,
@@ -50,7 +97,8 @@ def create_expense():
             group_id=group_id
         )
         
-        current_app.logger.info(f'Expense created successfully with ID: {expense_id}')
+        record_change(group_id)
+        current_app.logger.debug('Expense created successfully with ID: %s', expense_id)
         
         return jsonify({
             'success': True,
@@ -65,12 +113,116 @@ def create_expense():
         }), 201
         
     except ValueError as e:
-        current_app.logger.error(f'Validation error: {e}')
+        current_app.logger.error('Validation error: %s', e)
         return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f'Create expense error: {e}')
+        current_app.logger.error('Create expense error: %s', e)
         return jsonify({'success': False, 'error': 'Failed to create expense'}), 500
 
+def _read_bulk_rows():
+    """Read a JSON array or NDJSON request body. Returns (rows, error)"""
+    if request.mimetype == 'application/x-ndjson':
+        rows = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # Keep the row position so errors line up with the input
+                rows.append(None)
+        return rows, None
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('expenses')
+    if not isinstance(data, list):
+        return None, 'Request body must be a JSON array of expenses or NDJSON'
+    return data, None
+
+
+@expenses_bp.route('/expenses/bulk', methods=['POST'])
+def create_expenses_bulk():
+    """Create many expenses in one request (JSON array or NDJSON body)"""
+    rows, error = _read_bulk_rows()
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    if not rows:
+        return jsonify({'success': False, 'error': 'At least one expense is required'}), 400
+    
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({'success': False, 'error': f'Too many expenses (max {MAX_BULK_ROWS})'}), 400
+    
+    try:
+        if current_app.db is None:
+            return jsonify({'success': False, 'error': 'Database not available'}), 503
+        
+        expense_model = Expense(current_app.db)
+        
+        # Convert and validate every amount in one batch call
+        amounts_paisa, amount_status = rupees_to_paisa_batch(
+            [row.get('amount') if isinstance(row, dict) else None for row in rows]
+        )
+        
+        # Rows for a missing or deleted group would be orphaned
+        live = Group(current_app.db).live_among({
+            row.get('group_id') for row in rows
+            if isinstance(row, dict) and isinstance(row.get('group_id'), str)
+        })
+        
+        # Validate the remaining fields per row, then split and write the valid ones
+        errors = {}
+        valid_rows = []
+        valid_amounts = []
+        positions = []
+        for index, row in enumerate(rows):
+            if row is None:
+                errors[index] = 'Invalid JSON'
+                continue
+            fields, row_error = parse_expense(row, amount_valid=amount_status[index] != AMOUNT_INVALID)
+            if row_error:
+                errors[index] = row_error
+                continue
+            if amount_status[index] != AMOUNT_OK:
+                errors[index] = f'Invalid amount: {sanitize_amount(row.get("amount"))}'
+                continue
+            if fields['group_id'] and fields['group_id'] not in live:
+                errors[index] = 'Group not found'
+                continue
+            valid_rows.append(fields)
+            valid_amounts.append(amounts_paisa[index])
+            positions.append(index)
+        
+        built, build_errors = expense_model.build_expenses_batch(valid_rows, valid_amounts)
+        for position, message in build_errors.items():
+            errors[positions[position]] = message
+        positions = [positions[position] for position in sorted(built)]
+        documents = [built[position] for position in sorted(built)]
+        
+        try:
+            inserted, insert_errors = expense_model.insert_expenses_bulk(documents)
+        finally:
+            # Whatever was committed must not hide behind an unchanged ETag
+            for group_id in {document.get('group_id') for document in documents}:
+                record_change(group_id)
+        for position, message in insert_errors.items():
+            errors[positions[position]] = message
+        
+        current_app.logger.info('Bulk expenses: %d inserted, %d failed', len(inserted), len(errors))
+        
+        return jsonify({
+            'success': not errors,
+            'inserted': len(inserted),
+            'failed': len(errors),
+            'ids': [str(inserted[position]) for position in sorted(inserted)],
+            'errors': [{'row': index, 'error': errors[index]} for index in sorted(errors)]
+        }), 201 if inserted else 400
+        
+    except Exception as e:
+        current_app.logger.error('Bulk create expenses error: %s', e)
+        return jsonify({'success': False, 'error': 'Failed to create expenses'}), 500
+
 @expenses_bp.route('/expenses', methods=['GET'])
 def get_expenses():
     group_id = sanitize_string(request.args.get('group_id', ''), max_length=50) if request.args.get('group_id') else None
@@ -79,17 +231,34 @@ def get_expenses():
         if current_app.db is None:
             return jsonify({'error': 'Database not available'}), 503
             
+        # Answer unchanged polls before touching the data collections
+        etag = group_etag(group_id)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         expense_model = Expense(current_app.db)
-        expenses = expense_model.get_all_expenses(group_id)
+        projection = list_projection(request.args.get('fields'), EXPENSE_LIST_FIELDS)
+        raw = current_app.config['RAW_BSON_READS']
         
-        # Convert ObjectIds to strings
-        for expense in expenses:
-            expense['_id'] = str(expense['_id'])
-            if 'date' in expense:
-                expense['date'] = expense['date'].isoformat()
+        paginated = wants_page(request.args)
+        if paginated:
+            expenses, next_cursor = expense_model.get_expenses_page(
+                group_id,
+                limit=parse_limit(request.args.get('limit')),
+                cursor=request.args.get('cursor'),
+                projection=projection,
+                raw=raw
+            )
+        else:
+            expenses = expense_model.get_all_expenses(group_id, projection=projection, raw=raw)
         
-        return jsonify(expenses), 200
+        if paginated:
+            return with_etag(jsonify({'data': expenses, 'next_cursor': next_cursor}), etag), 200
+        return with_etag(jsonify(expenses), etag), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f'Get expenses error: {e}')
+        current_app.logger.error('Get expenses error: %s', e)
         return jsonify({'error': 'Failed to fetch expenses'}), 500
\ No newline at end of file
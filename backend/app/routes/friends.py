@@ -1,12 +1,23 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.utils.sanitize import sanitize_string, sanitize_email
+from app.utils.pagination import wants_page, parse_limit, paginate
+from app.utils.etag import group_etag, not_modified, with_etag, record_change
+from app.utils.projection import list_projection, read_collection
+from app.models.group import Group
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 friends_bp = Blueprint('friends', __name__)
 
+# Keyset pagination order (alphabetical)
+FRIEND_SORT = [('name', 1), ('_id', 1)]
+
+# Fields list responses may return (narrowed with ?fields=)
+FRIEND_LIST_FIELDS = ('name', 'email', 'group_id', 'created_at')
+
 @friends_bp.route('/friends', methods=['POST'])
 def add_friend():
-    current_app.logger.info('Adding new friend')
+    current_app.logger.debug('Adding new friend')
     data = request.get_json()
     
     if not data:
@@ -25,18 +36,12 @@ def add_friend():
             current_app.logger.error('Database connection not available for friends')
             return jsonify({'success': False, 'error': 'Database not available'}), 503
             
-        friends_collection = current_app.db.friends
-        
-        # Check if friend already exists in this group
-        query = {'email': email}
-        if group_id:
-            query['group_id'] = group_id
+        if group_id and not Group(current_app.db).is_live(group_id):
+            return jsonify({'success': False, 'error': 'Group not found'}), 404
         
-        existing_friend = friends_collection.find_one(query)
-        if existing_friend:
-            return jsonify({'success': False, 'error': 'Friend already exists'}), 400
+        friends_collection = current_app.db.friends
         
-        # Add friend
+        # The unique {group_id, email} index rejects a friend already in this group
         friend_data = {
             'name': name,
             'email': email,
@@ -46,8 +51,12 @@ def add_friend():
         if group_id:
             friend_data['group_id'] = group_id
         
-        result = friends_collection.insert_one(friend_data)
-        current_app.logger.info(f'Friend inserted with ID: {result.inserted_id}')
+        try:
+            result = friends_collection.insert_one(friend_data)
+        except DuplicateKeyError:
+            return jsonify({'success': False, 'error': 'Friend already exists'}), 400
+        record_change(group_id)
+        current_app.logger.debug('Friend inserted with ID: %s', result.inserted_id)
         
         return jsonify({
             'success': True,
@@ -60,7 +69,7 @@ def add_friend():
         }), 201
         
     except Exception as e:
-        current_app.logger.error(f'Add friend error: {e}')
+        current_app.logger.error('Add friend error: %s', e)
         return jsonify({'success': False, 'error': 'Failed to add friend'}), 500
 
 @friends_bp.route('/friends', methods=['GET'])
@@ -71,18 +80,36 @@ def get_friends():
         if current_app.db is None:
             return jsonify({'error': 'Database not available'}), 503
             
-        friends_collection = current_app.db.friends
-        query = {'group_id': group_id} if group_id else {}
-        friends = list(friends_collection.find(query).sort('name', 1))
+        # Answer unchanged polls before touching the data collections
+        etag = group_etag(group_id)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        friends_collection = read_collection(current_app.db.friends, current_app.config['RAW_BSON_READS'])
+        query = Group(current_app.db).live_query(group_id)
+        projection = list_projection(request.args.get('fields'), FRIEND_LIST_FIELDS)
         
-        # Convert ObjectIds to strings
-        for friend in friends:
-            friend['_id'] = str(friend['_id'])
-            if 'created_at' in friend:
-                friend['created_at'] = friend['created_at'].isoformat()
+        paginated = wants_page(request.args)
+        if query is None:
+            # Deleted group waiting for the reaper
+            friends, next_cursor = [], None
+        elif paginated:
+            friends, next_cursor = paginate(
+                friends_collection, query, FRIEND_SORT,
+                limit=parse_limit(request.args.get('limit')),
+                cursor=request.args.get('cursor'),
+                projection=projection
+            )
+        else:
+            friends = list(friends_collection.find(query, projection).sort('name', 1))
         
-        return jsonify(friends), 200
+        if paginated:
+            return with_etag(jsonify({'data': friends, 'next_cursor': next_cursor}), etag), 200
+        return with_etag(jsonify(friends), etag), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f'Get friends error: {e}')
+        current_app.logger.error('Get friends error: %s', e)
         return jsonify({'error': 'Failed to fetch friends'}), 500
\ No newline at end of file
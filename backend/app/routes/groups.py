@@ -1,9 +1,25 @@
-from flask import Blueprint, request, jsonify, current_app
-from app.models.group import Group
+from flask import Blueprint, Response, request, jsonify, current_app
+from app.models.group import Group, GROUP_LIST_FIELDS
+from app.models.balance import Balance
+from app.models.expense import Expense
+from app.routes.settlements import SETTLEMENT_SORT
+from app.utils.pagination import wants_page, parse_limit, paginate
+from app.utils.etag import group_etag, not_modified, with_etag, record_change
+from app.utils.money import paisa_to_rupees
+from app.utils.sanitize import sanitize_string
+from app.utils.json_provider import dumps_bytes
+from app.utils.projection import list_projection, read_collection
 from bson import ObjectId
 
 groups_bp = Blueprint('groups', __name__)
 
+# Documents fetched per server round trip while exporting
+EXPORT_BATCH_SIZE = 500
+
+
+def _export_line(record_type, document):
+    return dumps_bytes({'type': record_type, **document}) + b'\n'
+
 @groups_bp.route('/groups', methods=['POST'])
 def create_group():
     """Create new group"""
@@ -37,7 +53,7 @@ def create_group():
     except ValueError as e:
         return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f'Create group error: {e}')
+        current_app.logger.error('Create group error: %s', e)
         return jsonify({'success': False, 'error': 'Failed to create group'}), 500
 
 
@@ -51,31 +67,152 @@ def get_groups():
             return jsonify({'error': 'Database not available'}), 503
         
         group_model = Group(current_app.db)
+        projection = list_projection(request.args.get('fields'), GROUP_LIST_FIELDS)
+        raw = current_app.config['RAW_BSON_READS']
         
         if group_code:
             # Find specific group by code
-            group = group_model.get_group_by_code(group_code)
+            group = group_model.get_group_by_code(group_code, projection)
             if not group:
                 return jsonify({'error': 'Group not found'}), 404
             
-            group['_id'] = str(group['_id'])
-            group['created_at'] = group['created_at'].isoformat()
             return jsonify(group), 200
         else:
-            # Get all groups
-            groups = group_model.get_all_groups()
-            
-            for group in groups:
-                group['_id'] = str(group['_id'])
-                group['created_at'] = group['created_at'].isoformat()
+            # Get all groups (one page at a time when requested)
+            paginated = wants_page(request.args)
+            if paginated:
+                groups, next_cursor = group_model.get_groups_page(
+                    limit=parse_limit(request.args.get('limit')),
+                    cursor=request.args.get('cursor'),
+                    projection=projection,
+                    raw=raw
+                )
+            else:
+                groups = group_model.get_all_groups(projection=projection, raw=raw)
             
+            if paginated:
+                return jsonify({'data': groups, 'next_cursor': next_cursor}), 200
             return jsonify(groups), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f'Get groups error: {e}')
+        current_app.logger.error('Get groups error: %s', e)
         return jsonify({'error': 'Failed to fetch groups'}), 500
 
 
+@groups_bp.route('/groups/<group_id>/export', methods=['GET'])
+def export_group(group_id):
+    """Stream a group's expenses and settlements as NDJSON"""
+    try:
+        if current_app.db is None:
+            return jsonify({'error': 'Database not available'}), 503
+        
+        if not ObjectId.is_valid(group_id):
+            return jsonify({'error': 'Group not found'}), 404
+        
+        group = Group(current_app.db).get_group_by_id(group_id)
+        if not group:
+            return jsonify({'error': 'Group not found'}), 404
+        
+    except Exception as e:
+        current_app.logger.error('Export group error: %s', e)
+        return jsonify({'error': 'Failed to export group'}), 500
+    
+    db = current_app.db
+    raw = current_app.config['RAW_BSON_READS']
+    logger = current_app.logger
+    
+    def generate():
+        # One line per document, read in bounded batches so worker memory
+        # stays flat regardless of group size
+        yield _export_line('group', group)
+        for record_type, collection in (('expense', db.expenses), ('settlement', db.settlements)):
+            cursor = read_collection(collection, raw).find({'group_id': group_id}).sort('date', 1).batch_size(EXPORT_BATCH_SIZE)
+            try:
+                for document in cursor:
+                    yield _export_line(record_type, document)
+            except Exception as e:
+                logger.error('Export group %s failed mid-stream: %s', group_id, e)
+                yield _export_line('error', {'error': 'Export interrupted'})
+                return
+            finally:
+                cursor.close()
+    
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename=group-{group_id}.ndjson'}
+    )
+
+
+@groups_bp.route('/groups/<group_id>/members/<name>', methods=['GET'])
+def get_member(group_id, name):
+    """One member's balance, a page of their expense shares (newest first) and settlements"""
+    member = sanitize_string(name, max_length=100)
+    
+    try:
+        if current_app.db is None:
+            return jsonify({'error': 'Database not available'}), 503
+        
+        if not ObjectId.is_valid(group_id) or not member:
+            return jsonify({'error': 'Group not found'}), 404
+        
+        etag = group_etag(group_id)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        limit = parse_limit(request.args.get('limit'))
+        db = current_app.db
+        
+        if not Group(db).get_group_by_id(group_id):
+            return jsonify({'error': 'Group not found'}), 404
+        
+        balance_paisa = Balance(db).get_member_balance(group_id, member)
+        
+        expenses = []
+        page, next_cursor = Expense(db).get_expenses_by_participant(
+            group_id, member, limit, request.args.get('cursor')
+        )
+        for expense in page:
+            share_paisa = sum(share['share_paisa'] for share in expense.get('participant_shares', []))
+            paid_paisa = expense['amount_paisa'] if expense.get('payer') == member else 0
+            expenses.append({
+                '_id': expense['_id'],
+                'description': expense.get('description'),
+                'date': expense.get('date'),
+                'payer': expense.get('payer'),
+                'amount': paisa_to_rupees(expense['amount_paisa']),
+                'share': paisa_to_rupees(share_paisa),
+                'paid': paisa_to_rupees(paid_paisa)
+            })
+        
+        # Paged separately from the expenses, with its own cursor
+        settlements, settlements_next_cursor = paginate(
+            db.settlements,
+            {'group_id': group_id, '$or': [{'fromUser': member}, {'toUser': member}]},
+            SETTLEMENT_SORT, limit, request.args.get('settlements_cursor'),
+            projection={'fromUser': 1, 'toUser': 1, 'amount': 1, 'date': 1}
+        )
+        
+        return with_etag(jsonify({
+            'member': member,
+            'group_id': group_id,
+            'balance': paisa_to_rupees(balance_paisa),
+            'expenses': expenses,
+            'next_cursor': next_cursor,
+            'settlements': settlements,
+            'settlements_next_cursor': settlements_next_cursor
+        }), etag), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error('Get member error: %s', e)
+        return jsonify({'error': 'Failed to fetch member'}), 500
+
+
 @groups_bp.route('/groups/<group_id>', methods=['DELETE'])
 def delete_group(group_id):
     """Delete group and all associated data"""
@@ -83,23 +220,23 @@ def delete_group(group_id):
         if current_app.db is None:
             return jsonify({'error': 'Database not available'}), 503
         
-        # Delete group
+        # Tombstone the group; reads ignore it from here on
         group_model = Group(current_app.db)
         deleted = group_model.delete_group(group_id)
         
         if not deleted:
             return jsonify({'error': 'Group not found'}), 404
         
-        # Delete associated data
-        current_app.db.expenses.delete_many({'group_id': group_id})
-        current_app.db.friends.delete_many({'group_id': group_id})
-        current_app.db.settlements.delete_many({'group_id': group_id})
+        # Associated data is removed in batches by the background reaper
+        Balance(current_app.db).drop_group(group_id)
+        record_change(group_id)
+        current_app.reaper.wake()
         
         return jsonify({
             'success': True,
-            'message': 'Group and associated data deleted successfully'
-        }), 200
+            'message': 'Group deleted; associated data is being removed'
+        }), 202
         
     except Exception as e:
-        current_app.logger.error(f'Delete group error: {e}')
+        current_app.logger.error('Delete group error: %s', e)
         return jsonify({'error': 'Failed to delete group'}), 500
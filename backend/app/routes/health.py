@@ -6,37 +6,18 @@ health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health', methods=['GET', 'HEAD'])
 def health_check():
-    """Comprehensive health check for Render monitoring"""
-    try:
-        # Check database connection
-        db_status = 'connected' if current_app.db is not None else 'disconnected'
-        
-        # Basic app info
-        health_data = {
-            'status': 'healthy',
-            'timestamp': datetime.utcnow().isoformat(),
-            'database': db_status,
-            'environment': os.getenv('FLASK_ENV', 'unknown'),
-            'version': '1.0.0'
-        }
-        
-        # If database is available, test a simple query
-        if current_app.db is not None:
-            try:
-                current_app.db.command('ping')
-                health_data['database_ping'] = 'success'
-            except Exception as e:
-                health_data['database_ping'] = 'failed'
-                health_data['database_error'] = str(e)
-        
-        return jsonify(health_data), 200
-        
-    except Exception as e:
-        return jsonify({
-            'status': 'healthy',
-            'error': str(e),
-            'timestamp': datetime.utcnow().isoformat()
-        }), 200
+    """Detailed health check from the cached checker state (no database round trip)"""
+    health = current_app.health
+    health_data = {
+        'status': 'healthy' if health.ready else 'degraded',
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': health.database,
+        'environment': os.getenv('FLASK_ENV', 'unknown'),
+        'version': '1.0.0',
+        'debts_cache': current_app.debts_cache.stats(),
+        'checks': health.status()
+    }
+    return jsonify(health_data), 200
 
 @health_bp.route('/', methods=['GET'])
 def root():
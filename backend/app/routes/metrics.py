@@ -0,0 +1,12 @@
+from flask import Blueprint, Response, current_app
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition, aggregated over all workers"""
+    try:
+        return Response(current_app.metrics.render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        current_app.logger.error('Metrics error: %s', e)
+        return Response('# metrics unavailable\n', status=500, mimetype='text/plain')
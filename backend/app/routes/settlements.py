@@ -2,14 +2,25 @@ from flask import Blueprint, request, jsonify, current_app
 from bson import ObjectId
 from datetime import datetime
 from app.utils.money import rupees_to_paisa, paisa_to_rupees, validate_amount_paisa
+from app.utils.debt_optimizer import calculate_net_balances
+from app.models.balance import Balance
+from app.utils.pagination import wants_page, parse_limit, paginate
+from app.utils.etag import group_etag, not_modified, with_etag, record_change
+from app.utils.projection import list_projection, read_collection
+from app.models.group import Group
+
+# Keyset pagination order (newest first)
+SETTLEMENT_SORT = [('date', -1), ('_id', -1)]
+
+# Fields list responses may return (narrowed with ?fields=)
+SETTLEMENT_LIST_FIELDS = ('fromUser', 'toUser', 'amount', 'amount_paisa', 'date', 'currency', 'group_id')
 
 settlements_bp = Blueprint('settlements', __name__)
 
 @settlements_bp.route('/settlements', methods=['POST'])
 def create_settlement():
-    current_app.logger.info('Creating new settlement')
+    current_app.logger.debug('Creating new settlement')
     data = request.get_json()
-    current_app.logger.info(f'Settlement data received: {data}')
     
     if not data:
         return jsonify({'success': False, 'error': 'Request body is required'}), 400
@@ -37,6 +48,9 @@ def create_settlement():
         if current_app.db is None:
             return jsonify({'error': 'Database not available'}), 503
             
+        if group_id and not Group(current_app.db).is_live(group_id):
+            return jsonify({'success': False, 'error': 'Group not found'}), 404
+        
         settlements_collection = current_app.db.settlements
         
         settlement_data = {
@@ -52,7 +66,12 @@ def create_settlement():
         if group_id:
             settlement_data['group_id'] = group_id
         
-        result = settlements_collection.insert_one(settlement_data)
+        result = Balance(current_app.db).record(
+            group_id,
+            lambda: settlements_collection.insert_one(settlement_data),
+            calculate_net_balances([], [settlement_data])
+        )
+        record_change(group_id)
         
         return jsonify({
             'success': True,
@@ -66,7 +85,7 @@ def create_settlement():
         }), 201
         
     except Exception as e:
-        current_app.logger.error(f'Create settlement error: {e}')
+        current_app.logger.error('Create settlement error: %s', e)
         return jsonify({'success': False, 'error': 'Failed to create settlement'}), 500
 
 @settlements_bp.route('/settlements', methods=['GET'])
@@ -77,18 +96,36 @@ def get_settlements():
         if current_app.db is None:
             return jsonify({'error': 'Database not available'}), 503
             
-        settlements_collection = current_app.db.settlements
-        query = {'group_id': group_id} if group_id else {}
-        settlements = list(settlements_collection.find(query).sort('date', -1))
+        # Answer unchanged polls before touching the data collections
+        etag = group_etag(group_id)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        settlements_collection = read_collection(current_app.db.settlements, current_app.config['RAW_BSON_READS'])
+        query = Group(current_app.db).live_query(group_id)
+        projection = list_projection(request.args.get('fields'), SETTLEMENT_LIST_FIELDS)
         
-        # Convert ObjectIds to strings and format dates
-        for settlement in settlements:
-            settlement['_id'] = str(settlement['_id'])
-            if 'date' in settlement:
-                settlement['date'] = settlement['date'].isoformat()
+        paginated = wants_page(request.args)
+        if query is None:
+            # Deleted group waiting for the reaper
+            settlements, next_cursor = [], None
+        elif paginated:
+            settlements, next_cursor = paginate(
+                settlements_collection, query, SETTLEMENT_SORT,
+                limit=parse_limit(request.args.get('limit')),
+                cursor=request.args.get('cursor'),
+                projection=projection
+            )
+        else:
+            settlements = list(settlements_collection.find(query, projection).sort('date', -1))
         
-        return jsonify(settlements), 200
+        if paginated:
+            return with_etag(jsonify({'data': settlements, 'next_cursor': next_cursor}), etag), 200
+        return with_etag(jsonify(settlements), etag), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f'Get settlements error: {e}')
+        current_app.logger.error('Get settlements error: %s', e)
         return jsonify({'error': 'Failed to fetch settlements'}), 500
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Admission control.
+
+Every request draws tokens from a per-client-IP bucket and, when it names a
+group, from that group's bucket; the cost depends on the route, so one
+expensive /api/debts counts like several cheap reads. A bounded number of
+requests may be in flight per worker. Requests over either limit are
+rejected immediately (429 for rate limits, 503 when the worker is full)
+instead of queueing behind the work that overloaded it.
+
+Buckets live in worker memory, so limits apply per worker process.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Token cost per route rule; anything else costs DEFAULT_COST
+DEFAULT_ROUTE_COSTS = {
+    '/health': 0,
+    '/health/live': 0,
+    '/health/ready': 0,
+    '/api/health': 0,
+    '/api/metrics': 0,
+    '/api/debts': 5,
+    '/api/expenses/bulk': 10,
+    '/api/groups/<group_id>/export': 10,
+    '/api/groups/<group_id>/members/<name>': 2,
+}
+DEFAULT_COST = 1
+
+
+class TokenBuckets:
+    """Token buckets keyed by client or group, least recently used dropped first"""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _refill(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def wait(self, key, cost):
+        """Seconds until `cost` tokens are available (0 if they are now), spending nothing"""
+        with self._lock:
+            bucket = self._refill(key, time.monotonic())
+            return 0 if bucket[0] >= cost else (cost - bucket[0]) / self.rate
+
+    def take(self, key, cost):
+        """Spend `cost` tokens. Returns 0 if allowed, otherwise seconds until it would be."""
+        with self._lock:
+            bucket = self._refill(key, time.monotonic())
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0
+            return (cost - bucket[0]) / self.rate
+
+    def refund(self, key, cost):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+
+
+class AdmissionController:
+    def __init__(self, ip_rate=20, ip_burst=60, group_rate=50, group_burst=150,
+                 max_in_flight=10, route_costs=None, trust_proxy=False):
+        self.ip_buckets = TokenBuckets(ip_rate, ip_burst)
+        self.group_buckets = TokenBuckets(group_rate, group_burst)
+        self.max_in_flight = max_in_flight
+        self.route_costs = {**DEFAULT_ROUTE_COSTS, **(route_costs or {})}
+        self.trust_proxy = trust_proxy
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def client_ip(self, request):
+        if self.trust_proxy and request.access_route:
+            # The right-most X-Forwarded-For hop is the one our proxy (Render)
+            # appended; entries before it are whatever the client sent
+            return request.access_route[-1]
+        return request.remote_addr
+
+    def cost(self, request):
+        if request.method == 'OPTIONS':
+            return 0
+        route = request.url_rule.rule if request.url_rule else None
+        return self.route_costs.get(route, DEFAULT_COST)
+
+    def admit(self, request, cost):
+        """
+        Charge a request (cost > 0; zero-cost routes skip admission). Returns
+        None when it may proceed (call release() when it ends), else
+        (status, reason, retry_after_seconds). Tokens are only spent by
+        requests that are admitted.
+        """
+        client = self.client_ip(request)
+        group_id = request.args.get('group_id') or (request.view_args or {}).get('group_id')
+
+        wait = self.ip_buckets.wait(client, cost)
+        if wait:
+            return 429, 'client_rate', wait
+        if group_id:
+            wait = self.group_buckets.wait(group_id, cost)
+            if wait:
+                return 429, 'group_rate', wait
+
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                return 503, 'in_flight', 1
+            self._in_flight += 1
+
+        # Another thread may have spent the tokens since the checks above
+        rejected = None
+        wait = self.ip_buckets.take(client, cost)
+        if wait:
+            rejected = 429, 'client_rate', wait
+        elif group_id:
+            wait = self.group_buckets.take(group_id, cost)
+            if wait:
+                self.ip_buckets.refund(client, cost)
+                rejected = 429, 'group_rate', wait
+        if rejected:
+            self.release()
+        return rejected
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+
+def retry_after(seconds):
+    """Retry-After header value (whole seconds, at least 1)"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def parse_costs(value):
+    """'/api/debts=8,/api/expenses=2' -> {'/api/debts': 8, '/api/expenses': 2}"""
+    costs = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            route, cost = item.rsplit('=', 1)
+            costs[route.strip()] = float(cost)
+    return costs
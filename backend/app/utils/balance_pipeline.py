@@ -0,0 +1,125 @@
+"""
+Server-side net balance computation.
+
+Pushes the fold done by debt_optimizer.calculate_net_balances into a single
+MongoDB aggregation so only {member, balance_paisa} rows cross the wire.
+Sign conventions match calculate_net_balances:
+Positive = person is owed money
+Negative = person owes money
+"""
+
+
+def _as_entries(entries):
+    """Stages turning each document into one row per balance entry"""
+    return [
+        {'$project': {'_id': 0, 'entries': entries}},
+        {'$unwind': '$entries'},
+        {'$replaceRoot': {'newRoot': '$entries'}}
+    ]
+
+
+def net_balance_pipeline(query, settlements_collection='settlements'):
+    """
+    Build the aggregation pipeline, run against the expenses collection.
+
+    Expenses: payer +amount_paisa, each participant -share_paisa.
+    Settlements ($unionWith): fromUser +amount_paisa, toUser -amount_paisa.
+    """
+    expense_match = dict(query)
+    expense_match['payer'] = {'$nin': [None, '']}
+    expense_match['participant_shares.0'] = {'$exists': True}
+
+    settlement_match = dict(query)
+    settlement_match['fromUser'] = {'$nin': [None, '']}
+    settlement_match['toUser'] = {'$nin': [None, '']}
+    settlement_match['amount_paisa'] = {'$gt': 0}
+
+    expense_entries = {
+        '$concatArrays': [
+            [{'member': '$payer', 'balance_paisa': {'$ifNull': ['$amount_paisa', 0]}}],
+            {'$map': {
+                'input': '$participant_shares',
+                'as': 'share',
+                'in': {
+                    'member': '$$share.name',
+                    'balance_paisa': {'$multiply': ['$$share.share_paisa', -1]}
+                }
+            }}
+        ]
+    }
+
+    settlement_entries = [
+        {'member': '$fromUser', 'balance_paisa': '$amount_paisa'},
+        {'member': '$toUser', 'balance_paisa': {'$multiply': ['$amount_paisa', -1]}}
+    ]
+
+    return [
+        {'$match': expense_match},
+        *_as_entries(expense_entries),
+        {'$unionWith': {
+            'coll': settlements_collection,
+            'pipeline': [{'$match': settlement_match}, *_as_entries(settlement_entries)]
+        }},
+        {'$group': {'_id': '$member', 'balance_paisa': {'$sum': '$balance_paisa'}}},
+        {'$project': {'_id': 0, 'member': '$_id', 'balance_paisa': 1}}
+    ]
+
+
+def aggregate_net_balances(db, query):
+    """
+    Calculate net balance for each person in paisa inside MongoDB.
+    Returns the same dict as calculate_net_balances.
+    """
+    rows = db.expenses.aggregate(net_balance_pipeline(query, db.settlements.name))
+    return {row['member']: row['balance_paisa'] for row in rows}
+
+
+def pairwise_expense_pipeline(query):
+    """What each participant owes each payer: {debtor, creditor, amount_paisa} rows"""
+    match = dict(query)
+    match['payer'] = {'$nin': [None, '']}
+    return [
+        {'$match': match},
+        {'$unwind': '$participant_shares'},
+        {'$match': {'$expr': {'$ne': ['$participant_shares.name', '$payer']}}},
+        {'$group': {
+            '_id': {'debtor': '$participant_shares.name', 'creditor': '$payer'},
+            'amount_paisa': {'$sum': '$participant_shares.share_paisa'}
+        }}
+    ]
+
+
+def pairwise_settlement_pipeline(query):
+    """What each person has paid each other person: {debtor, creditor, amount_paisa} rows"""
+    match = dict(query)
+    match['fromUser'] = {'$nin': [None, '']}
+    match['toUser'] = {'$nin': [None, '']}
+    match['amount_paisa'] = {'$gt': 0}
+    return [
+        {'$match': match},
+        {'$group': {
+            '_id': {'debtor': '$fromUser', 'creditor': '$toUser'},
+            'amount_paisa': {'$sum': '$amount_paisa'}
+        }}
+    ]
+
+
+def aggregate_pairwise_debts(db, query):
+    """
+    Sparse pairwise ledger: {(debtor, creditor): paisa} for pairs that still
+    owe something after settlements. Only pairs that actually transacted are
+    materialized, so memory scales with real relationships rather than with
+    the square of the member count.
+    """
+    debts = {}
+    for row in db.expenses.aggregate(pairwise_expense_pipeline(query)):
+        pair = (row['_id']['debtor'], row['_id']['creditor'])
+        debts[pair] = row['amount_paisa']
+
+    # Settlements only reduce existing debts, and never below zero
+    for row in db.settlements.aggregate(pairwise_settlement_pipeline(query)):
+        pair = (row['_id']['debtor'], row['_id']['creditor'])
+        if pair in debts:
+            debts[pair] -= row['amount_paisa']
+
+    return {pair: amount for pair, amount in debts.items() if amount > 0}
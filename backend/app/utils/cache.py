@@ -0,0 +1,75 @@
+"""
+Bounded in-process LRU cache with TTL, used for computed debt responses.
+
+Entries are keyed by a tuple whose first element is the group_id (None for
+unscoped requests) so writes can invalidate everything derived from a group.
+Each entry also remembers the group version it was computed at; a lookup
+with a newer version misses, which keeps workers that did not see the write
+correct. The TTL is a last-resort safety net on top of both.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version=None):
+        """Cached value for key at version, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, entry_version, expires_at = entry
+            if expires_at <= now or entry_version != version:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_group(self, group_id):
+        """Drop entries for group_id and for unscoped (all-groups) requests"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] in (group_id, None)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,121 @@
+"""
+Response compression.
+
+JSON and NDJSON responses are compressed with brotli (when the Brotli
+package is installed) or gzip, whichever the client prefers in
+Accept-Encoding. Buffered bodies smaller than `min_size` are sent as is.
+Streamed responses (the NDJSON export) are compressed chunk by chunk as the
+generator yields, so the payload is never held in memory. A strong ETag on a
+compressed response is made weak, since it describes the uncompressed bytes.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson')
+
+
+def parse_accept_encoding(header):
+    """'gzip;q=0.5, br' -> {'gzip': 0.5, 'br': 1.0}"""
+    accepted = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=4, brotli_quality=4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def available(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self, header):
+        """The encoding to use for an Accept-Encoding header, or None"""
+        accepted = parse_accept_encoding(header)
+        best, best_q = None, 0.0
+        # Listed in order of preference, so ties go to brotli
+        for coding in self.available():
+            q = accepted.get(coding, accepted.get('*', 0.0))
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip_compress(data, self.gzip_level)
+
+    def compress_stream(self, chunks, encoding):
+        """Compress an iterable of byte chunks incrementally"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            compress, finish = compressor.compress, compressor.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                # The compressor buffers small chunks and emits full blocks
+                out = compress(chunk)
+                if out:
+                    yield out
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def process(self, request, response):
+        """after_request hook: compress `response` if the client accepts it"""
+        if request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers:
+            return response
+        if response.direct_passthrough:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self.compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressed = self.compress(data, encoding)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The tag was computed for the identity body; the encoded bytes differ
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def gzip_compress(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
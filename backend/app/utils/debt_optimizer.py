@@ -2,6 +2,19 @@
 Optimized debt settlement algorithm.
 Minimizes number of transactions using net balance approach.
 """
+import time
+
+# Largest DP state space (product of per-amount counts + 1, i.e. 2**members
+# when every balance is distinct) the exact solver will attempt
+MAX_EXACT_STATES = 1 << 20
+
+# Measured CPU cost of one DP step (one state x one distinct amount); with the
+# time budget this decides up front whether the DP can finish, so hopeless
+# inputs go straight to greedy instead of burning the budget first
+EXACT_STEP_SECONDS = 100e-9
+
+# Default CPU time budget for the exact solver, in seconds
+DEFAULT_EXACT_BUDGET = 0.2
 
 def calculate_net_balances(expenses, settlements):
     """
@@ -54,54 +67,186 @@ def optimize_settlements(balances):
     3. Match largest debtor with largest creditor
     4. Continue until all balanced
     
+    Only names are sorted (keyed on the balances dict itself) and the two
+    amounts being matched are held as plain ints, so no per-person records
+    are allocated; this keeps groups of 100k+ people cheap.
+    
     Time Complexity: O(n log n) for sorting
     Space Complexity: O(n)
     """
-    # Separate debtors and creditors
-    debtors = []   # People who owe money (negative balance)
-    creditors = []  # People who are owed money (positive balance)
-    
-    for person, balance in balances.items():
-        if balance < 0:
-            debtors.append({'name': person, 'amount': -balance})  # Store as positive
-        elif balance > 0:
-            creditors.append({'name': person, 'amount': balance})
-    
-    # Sort by amount (largest first) for optimal matching
-    debtors.sort(key=lambda x: x['amount'], reverse=True)
-    creditors.sort(key=lambda x: x['amount'], reverse=True)
+    # Separate debtors and creditors, largest amount first (ties keep
+    # balance order)
+    debtors = sorted([p for p, b in balances.items() if b < 0], key=balances.__getitem__)
+    creditors = sorted([p for p, b in balances.items() if b > 0], key=balances.__getitem__, reverse=True)
     
     # Generate optimized settlements
     settlements = []
+    if not debtors or not creditors:
+        return settlements
+    
     i, j = 0, 0
+    debtor, creditor = debtors[0], creditors[0]
+    owes, owed = -balances[debtor], balances[creditor]
     
-    while i < len(debtors) and j < len(creditors):
-        debtor = debtors[i]
-        creditor = creditors[j]
-        
-        # Settle the minimum of what debtor owes and creditor is owed
-        settle_amount = min(debtor['amount'], creditor['amount'])
-        
-        if settle_amount > 0:
-            settlements.append({
-                'from': debtor['name'],
-                'to': creditor['name'],
-                'amount_paisa': settle_amount
-            })
-        
-        # Update remaining amounts
-        debtor['amount'] -= settle_amount
-        creditor['amount'] -= settle_amount
-        
-        # Move to next person if current is settled
-        if debtor['amount'] == 0:
+    while True:
+        # Settle the minimum of what debtor owes and creditor is owed, then
+        # move to the next person once the current one is settled
+        if owes < owed:
+            settlements.append({'from': debtor, 'to': creditor, 'amount_paisa': owes})
+            owed -= owes
             i += 1
-        if creditor['amount'] == 0:
+            if i == len(debtors):
+                break
+            debtor = debtors[i]
+            owes = -balances[debtor]
+        else:
+            settlements.append({'from': debtor, 'to': creditor, 'amount_paisa': owed})
+            owes -= owed
             j += 1
+            if j == len(creditors):
+                break
+            creditor = creditors[j]
+            owed = balances[creditor]
+            if owes == 0:
+                i += 1
+                if i == len(debtors):
+                    break
+                debtor = debtors[i]
+                owes = -balances[debtor]
     
     return settlements
 
 
+def _max_zero_sum_groups(values, counts, deadline):
+    """
+    Partition a multiset of balances (distinct non-zero values, each held by
+    counts[j] people, summing to zero) into the maximum number of zero-sum
+    groups.
+
+    People with the same balance are interchangeable, so instead of a
+    bitmask over people the DP runs over how many of each value are used:
+    a mixed-radix state with prod(count + 1) entries, which is 2**n only
+    when every balance is distinct. dp[state] = best number of zero-sum
+    groups within state, built by removing one person at a time; state
+    contributes one more group when its own sum is zero. Returns a list of
+    groups as lists of value indices, or None if the thread CPU time passes
+    deadline.
+    """
+    k = len(values)
+    strides = []
+    size = 1
+    for count in counts:
+        strides.append(size)
+        size *= count + 1
+    sums = [0] * size
+    dp = [0] * size
+    digits = [0] * k
+
+    for state in range(1, size):
+        if not state & 1023 and time.thread_time() > deadline:
+            return None
+
+        # Advance the mixed-radix counter; j ends on the lowest non-zero digit
+        j = 0
+        while digits[j] == counts[j]:
+            digits[j] = 0
+            j += 1
+        digits[j] += 1
+
+        sums[state] = sums[state - strides[j]] + values[j]
+
+        best = dp[state - strides[j]]
+        for other in range(j + 1, k):
+            if digits[other] and dp[state - strides[other]] > best:
+                best = dp[state - strides[other]]
+        dp[state] = best + (1 if sums[state] == 0 else 0)
+
+    # Walk back from the full state; people removed between two zero-sum
+    # states form one group
+    groups = []
+    current = []
+    state = size - 1
+    digits = list(counts)
+    while state:
+        target = dp[state] - (1 if sums[state] == 0 else 0)
+        for j in range(k):
+            if digits[j] and dp[state - strides[j]] == target:
+                break
+        current.append(j)
+        digits[j] -= 1
+        state -= strides[j]
+        if sums[state] == 0:
+            groups.append(current)
+            current = []
+
+    return groups
+
+
+def optimize_settlements_exact(balances, time_budget=DEFAULT_EXACT_BUDGET):
+    """
+    Generate the true minimum number of settlements.
+
+    A group of k people whose balances sum to zero needs k - 1 transfers, so
+    the minimum is (people - number of zero-sum groups) and the problem is
+    finding the maximum number of zero-sum groups:
+    1. Pair off people with exactly opposite balances (always optimal)
+    2. Partition the rest with a DP over balance counts (_max_zero_sum_groups)
+    3. Settle each group with the greedy matcher (k - 1 transfers each)
+
+    Falls back to the greedy plan for the unpaired people when the DP would
+    need more than MAX_EXACT_STATES states or an estimated time_budget
+    seconds of CPU (so roughly 16 people with all-distinct balances at the
+    default 200ms, many more when balances repeat), or if it actually
+    exceeds time_budget seconds of thread CPU time.
+    """
+    deadline = time.thread_time() + time_budget
+
+    # Step 1: cancel exact opposite pairs
+    settlements = []
+    unmatched = {}  # balance -> names waiting for an opposite partner
+    remaining = {}
+    for person in sorted(balances):
+        balance = balances[person]
+        if balance == 0:
+            continue
+        partners = unmatched.get(-balance)
+        if partners:
+            partner = partners.pop()
+            remaining.pop(partner)
+            debtor, creditor = (person, partner) if balance < 0 else (partner, person)
+            settlements.append({'from': debtor, 'to': creditor, 'amount_paisa': abs(balance)})
+        else:
+            unmatched.setdefault(balance, []).append(person)
+            remaining[person] = balance
+
+    if not remaining:
+        return settlements
+
+    # Step 2: maximum zero-sum partition of the rest
+    holders = {}  # balance -> names, in the order they were first seen
+    for name, balance in remaining.items():
+        holders.setdefault(balance, []).append(name)
+    values = list(holders)
+    counts = [len(holders[value]) for value in values]
+
+    states = 1
+    for count in counts:
+        states *= count + 1
+
+    groups = None
+    if states <= MAX_EXACT_STATES and states * len(values) * EXACT_STEP_SECONDS <= time_budget:
+        groups = _max_zero_sum_groups(values, counts, deadline)
+
+    if groups is None:
+        return settlements + optimize_settlements(remaining)
+
+    # Step 3: each zero-sum group settles in (size - 1) transfers
+    for group in groups:
+        settlements.extend(optimize_settlements({holders[values[j]].pop(): values[j] for j in group}))
+
+    return settlements
+
+
 def calculate_optimized_debts(expenses, settlements):
     """
     Main function: Calculate optimized debt settlements.
@@ -0,0 +1,69 @@
+"""Conditional GET support keyed on per-group versions"""
+from bson import ObjectId
+from flask import current_app, request
+from app.models.group_version import GroupVersion, ALL_GROUPS
+
+# app.extensions key: groups whose version bump failed in this worker
+PENDING_BUMPS = 'pending_version_bumps'
+
+
+def _pending_bumps(app):
+    return app.extensions.setdefault(PENDING_BUMPS, set())
+
+
+def flush_pending_bumps(app):
+    """Retry version bumps that failed after their write; returns those still pending"""
+    pending = _pending_bumps(app)
+    for group_id in list(pending):
+        try:
+            GroupVersion(app.db).bump(group_id)
+        except Exception as e:
+            app.logger.warning('Version bump for group %s still failing: %s', group_id, e)
+            break
+        pending.discard(group_id)
+    return pending
+
+
+def group_etag(group_id):
+    """ETag for the current state of group_id (or all data). Read before the data."""
+    pending = flush_pending_bumps(current_app) if _pending_bumps(current_app) else ()
+    version = GroupVersion(current_app.db).get(group_id)
+    etag = f'{group_id or ALL_GROUPS}-{version}'
+    if pending and (group_id is None or group_id in pending):
+        # A write is not reflected in the version yet: a one-off tag never
+        # matches If-None-Match or a cached debts entry
+        etag += f'-{ObjectId()}'
+    return etag
+
+
+def not_modified(etag):
+    """A 304 response if the client already holds etag, otherwise None"""
+    # Weak comparison (RFC 7232): compressed responses carry the tag as W/"..."
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag):
+    """Attach etag and ask clients to revalidate on every use"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def record_change(group_id):
+    """
+    Bump group_id's version and drop cached responses after a successful write.
+
+    Never raises: the write is already stored, and reporting it as failed
+    invites a duplicate retry. A failed bump is kept pending and retried
+    (next group_etag call, health check tick); meanwhile this worker
+    serves the group without a matchable ETag.
+    """
+    current_app.debts_cache.invalidate_group(group_id)
+    try:
+        GroupVersion(current_app.db).bump(group_id)
+    except Exception as e:
+        current_app.logger.error('Failed to bump version for group %s, will retry: %s', group_id, e)
+        _pending_bumps(current_app).add(group_id)
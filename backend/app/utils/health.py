@@ -0,0 +1,143 @@
+"""
+Cached database health and readiness.
+
+The app boots without waiting for MongoDB. Each worker runs a HealthChecker
+thread that pings the database every `interval` seconds (every
+RETRY_INTERVAL while it is unreachable) and keeps the result in memory, so health probes
+never touch the database themselves. The first time the database answers,
+the checker optionally creates the declared indexes and warms the debts
+cache for the most recently written groups; /health/ready reports ready
+only after that. An index that fails to build (e.g. existing duplicates
+for a unique index) is logged and listed in the status, but does not keep
+the worker unready: it needs an operator (`flask ensure-indexes --dedupe`),
+and the next worker to start retries it.
+
+Readiness only gates the probe. API requests are served throughout and
+wait for MongoDB server selection like any other query.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+RETRY_INTERVAL = 1
+
+
+class HealthChecker:
+    def __init__(self, app, interval=10, warm_indexes=True, warm_groups=0):
+        self.app = app
+        self.interval = interval
+        self.warm_indexes = warm_indexes
+        self.warm_groups = warm_groups
+        self.database = 'connecting'
+        self.warmed = False
+        self._indexes_done = False
+        self.index_failures = []
+        self.last_check = None
+        self.ping_ms = None
+        self.error = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def database_down(self):
+        """True once a ping has failed, until one succeeds again"""
+        return self.database == 'disconnected'
+
+    @property
+    def ready(self):
+        return self.database == 'connected' and self.warmed
+
+    def ensure_started(self):
+        """Start the checker thread in this process (call after fork, e.g. per request)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='health-checker', daemon=True).start()
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'database': self.database,
+            'warmed': self.warmed,
+            'last_check': self.last_check,
+            'ping_ms': self.ping_ms,
+            'error': self.error,
+            'index_failures': self.index_failures,
+        }
+
+    def check(self):
+        """Ping the database once and warm up after the first success"""
+        started = time.perf_counter()
+        try:
+            self.app.mongo.database.command('ping')
+        except Exception as e:
+            if self.database != 'disconnected':
+                logger.error('MongoDB unavailable: %s', e)
+            self.database = 'disconnected'
+            self.error = str(e)
+            self.ping_ms = None
+        else:
+            if self.database != 'connected':
+                logger.info('MongoDB connected: %s', self.app.mongo.database_name)
+            self.database = 'connected'
+            self.error = None
+            self.ping_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.last_check = datetime.utcnow().isoformat()
+
+        if self.database == 'connected' and not self.warmed:
+            self.warm_up()
+        if self.database == 'connected':
+            from app.utils.etag import flush_pending_bumps
+            flush_pending_bumps(self.app)
+
+    def warm_up(self):
+        """Run the warmup steps; leaves `warmed` False (retried next tick) only if index reconciliation itself failed"""
+        db = self.app.mongo.database
+        if self.warm_indexes and not self._indexes_done:
+            from app.models.indexes import ensure_indexes
+            try:
+                report = ensure_indexes(db)
+            except Exception as e:
+                logger.warning('Index bootstrap failed, retrying: %s', e)
+                return
+            if report['created']:
+                logger.info('Created indexes: %s', report['created'])
+            # ensure_indexes logs failures; they are usually a data problem
+            # and must not take the API down with them
+            self.index_failures = report['failed']
+            self._indexes_done = True
+
+        if self.warm_groups:
+            from app.models.group_version import GroupVersion
+            from app.routes.debts import get_debts
+            try:
+                group_ids = GroupVersion(db).recently_changed(self.warm_groups)
+            except Exception as e:
+                logger.warning('Cache warmup failed: %s', e)
+                group_ids = []
+            for group_id in group_ids:
+                try:
+                    # Runs the view without the request hooks (no rate limits or metrics)
+                    with self.app.test_request_context('/api/debts', query_string={'group_id': group_id}):
+                        get_debts()
+                except Exception as e:
+                    logger.warning('Cache warmup failed for group %s: %s', group_id, e)
+            logger.info('Warmed debts cache for %d groups', len(group_ids))
+
+        self.warmed = True
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error('Health check failed: %s', e)
+            # Reconnect quickly; retry a failed warmup at the normal pace
+            time.sleep(self.interval if self.database == 'connected' else RETRY_INTERVAL)
@@ -0,0 +1,75 @@
+"""
+BSON-aware JSON provider.
+
+Routes can jsonify documents straight from pymongo: ObjectId becomes its hex
+string, datetime its ISO-8601 string, Decimal128/Decimal a decimal string
+and RawBSONDocument the document it holds. orjson is used when installed; otherwise the standard library
+encoder produces the same output.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import Decimal128, ObjectId, decode
+from bson.raw_bson import RawBSONDocument
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def bson_default(value):
+    """Encoder fallback for types JSON has no native form for"""
+    if isinstance(value, RawBSONDocument):
+        # Decode the whole document in one call; its values come back here
+        return decode(value.raw)
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps_bytes(obj, sort_keys=False, indent=False):
+    """Serialize to UTF-8 bytes (also used for NDJSON export lines)"""
+    if orjson is not None:
+        options = _ORJSON_OPTIONS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=bson_default, option=options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits: let the standard encoder try
+            pass
+    return json.dumps(obj, default=bson_default, sort_keys=sort_keys, ensure_ascii=False,
+                      indent=2 if indent else None, separators=None if indent else (',', ':')).encode()
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    # Key order is the document order; sorting every response costs time for nothing
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            return dumps_bytes(obj, sort_keys=self.sort_keys).decode()
+        kwargs.setdefault('default', bson_default)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = dumps_bytes(obj, sort_keys=self.sort_keys, indent=indent) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,153 @@
+"""
+Non-blocking structured logging.
+
+Request threads only put records on an in-memory queue; a QueueListener
+thread formats them (JSON or plain text) and writes to stdout. Records are
+queued unformatted, so %-style arguments are only rendered by the writer and
+only for records that pass the level check.
+
+Request access logs go through RequestLogSampler: per-route sampling rates
+and an optional slow-request-only mode keep the log volume independent of
+traffic. Server errors are always logged.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    QueueHandler that defers formatting to the listener thread and starts
+    the listener in whichever process emits first (gunicorn forks workers
+    after the app module may have been imported).
+    """
+
+    def __init__(self, target):
+        super().__init__(queue.Queue())
+        self.target = target
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Formatting happens in the listener thread, so log arguments must
+        # not be mutated after the call (pass values, not live documents)
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        self.queue.put_nowait(record)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited through fork may hold the parent's records
+            self.queue = queue.Queue()
+            self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+
+def configure_logging(production):
+    """
+    Route the root logger through a background queue writer.
+
+    LOG_FORMAT is 'json' (default in production) or 'text'; LOG_LEVEL
+    defaults to INFO in production and DEBUG otherwise.
+    """
+    level = os.getenv('LOG_LEVEL', 'INFO' if production else 'DEBUG').upper()
+    log_format = os.getenv('LOG_FORMAT', 'json' if production else 'text')
+
+    stream = logging.StreamHandler(sys.stdout)
+    if log_format == 'json':
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, BackgroundQueueHandler):
+            handler.stop()
+        root.removeHandler(handler)
+    root.addHandler(BackgroundQueueHandler(stream))
+    root.setLevel(level)
+
+
+def parse_rates(value):
+    """'/api/debts=0.1,/api/expenses=0.5' -> {'/api/debts': 0.1, '/api/expenses': 0.5}"""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            route, rate = item.rsplit('=', 1)
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+class RequestLogSampler:
+    """
+    Decides which requests get an access log line.
+
+    - slow_ms: when set, only requests at least this slow are logged
+    - rates: per-route sampling rate (route rule as registered, e.g.
+      '/api/groups/<group_id>/export'), falling back to default_rate
+    - responses with status >= 500 are always logged
+    """
+
+    def __init__(self, default_rate=1.0, rates=None, slow_ms=None):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self.slow_ms = slow_ms
+
+    @classmethod
+    def from_env(cls):
+        slow_ms = os.getenv('LOG_SLOW_MS')
+        return cls(
+            default_rate=float(os.getenv('LOG_SAMPLE_RATE', '1.0')),
+            rates=parse_rates(os.getenv('LOG_SAMPLE_RATES')),
+            slow_ms=float(slow_ms) if slow_ms else None
+        )
+
+    def should_log(self, route, status, duration_ms):
+        if status >= 500:
+            return True
+        if self.slow_ms is not None and duration_ms < self.slow_ms:
+            return False
+        rate = self.rates.get(route, self.default_rate)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
@@ -0,0 +1,350 @@
+"""
+Prometheus-style metrics.
+
+Each worker process records request latencies, request counts, MongoDB
+command durations (through a pymongo CommandListener) and connection pool
+gauges in memory. A background thread periodically writes the worker's
+snapshot to METRICS_DIR; /api/metrics merges every worker's snapshot so the
+numbers are correct across gunicorn workers. Counters of workers that have
+exited are folded into an archive file so totals never go backwards; their
+gauges are dropped.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from pymongo import common, monitoring
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, label names, help)
+METRICS = {
+    'easyxpense_http_requests_total': (
+        'counter', ('blueprint', 'route', 'method', 'status'), 'HTTP requests by route and status'),
+    'easyxpense_http_request_duration_seconds': (
+        'histogram', ('blueprint', 'route', 'method'), 'HTTP request latency'),
+    'easyxpense_mongo_command_duration_seconds': (
+        'histogram', ('collection', 'command'), 'MongoDB command latency'),
+    'easyxpense_mongo_command_failures_total': (
+        'counter', ('collection', 'command'), 'Failed MongoDB commands'),
+    'easyxpense_mongo_pool_connections': (
+        'gauge', ('address',), 'Open MongoDB connections'),
+    'easyxpense_mongo_pool_checked_out': (
+        'gauge', ('address',), 'MongoDB connections currently checked out'),
+    'easyxpense_mongo_pool_checkout_failures_total': (
+        'counter', ('reason',), 'Failed MongoDB connection checkouts'),
+    'easyxpense_mongo_pool_checkout_wait_seconds': (
+        'histogram', ('address',), 'Time spent waiting for a MongoDB connection'),
+    'easyxpense_mongo_pool_max_size': (
+        'gauge', ('address',), 'MongoDB connection pool size limit'),
+    'easyxpense_requests_shed_total': (
+        'counter', ('route', 'reason'), 'Requests rejected by admission control'),
+    'easyxpense_requests_in_flight': ('gauge', (), 'Admitted requests currently being served'),
+    'easyxpense_debts_cache_hits_total': ('counter', (), 'Debts response cache hits'),
+    'easyxpense_debts_cache_misses_total': ('counter', (), 'Debts response cache misses'),
+}
+
+ARCHIVE_FILE = 'archive.json'
+
+
+class Metrics:
+    def __init__(self, directory=None, flush_interval=10):
+        self.directory = directory or os.getenv(
+            'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'easyxpense-metrics'))
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        # Process whose numbers are held in memory (the master, if preloaded)
+        self._owner_pid = os.getpid()
+        self._collectors = []
+        self._reset()
+
+    def _reset(self):
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    # Recording
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        key = (name, labels)
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def add_gauge(self, name, labels, amount):
+        key = (name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def add_collector(self, collect):
+        """Register a callable returning [(name, labels, value)] read at snapshot time"""
+        self._collectors.append(collect)
+
+    # Per-worker lifecycle
+
+    def ensure_worker(self):
+        """
+        Start the flusher in this process (call after fork, e.g. per request).
+        Must run before anything in the new process records: numbers
+        inherited from the parent are dropped here.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._owner_pid != pid:
+                # Forked from a process that already recorded: start clean
+                self._reset()
+                self._owner_pid = pid
+            self._pid = pid
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(h[0]), h[1], h[2]]
+                               for (name, labels), h in self._histograms.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self._gauges.items()],
+            }
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                snapshot['counters'].append([name, list(labels), value])
+        return snapshot
+
+    def flush(self):
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    # Aggregation across workers
+
+    def collect_all(self):
+        """Merge the snapshots of every worker (flushing this one first)"""
+        self.ensure_worker()
+        self.flush()
+
+        merged = _empty()
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+            archive = _empty()
+            _merge(archive, _load(archive_path) or {}, gauges=False)
+            archive_changed = False
+
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json') or filename == ARCHIVE_FILE:
+                    continue
+                path = os.path.join(self.directory, filename)
+                snapshot = _load(path)
+                if snapshot is None:
+                    continue
+                if _alive(int(filename[:-5])):
+                    _merge(merged, snapshot, gauges=True)
+                else:
+                    # Exited worker: keep its counters, drop its gauges
+                    _merge(archive, snapshot, gauges=False)
+                    os.remove(path)
+                    archive_changed = True
+
+            if archive_changed:
+                with open(archive_path, 'w') as f:
+                    json.dump(_dump(archive), f)
+            _merge(merged, _dump(archive), gauges=False)
+
+        return merged
+
+    def render(self):
+        """Prometheus text exposition of all workers combined"""
+        merged = self.collect_all()
+        lines = []
+        for name, (kind, label_names, help_text) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for labels, (buckets, total, count) in sorted(merged['histograms'].get(name, {}).items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(BUCKETS + ('+Inf',), buckets):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{_labels(label_names, labels, le=bound)} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(label_names, labels)} {total}')
+                    lines.append(f'{name}_count{_labels(label_names, labels)} {count}')
+            else:
+                section = 'gauges' if kind == 'gauge' else 'counters'
+                for labels, value in sorted(merged[section].get(name, {}).items()):
+                    lines.append(f'{name}{_labels(label_names, labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _empty():
+    return {'counters': {}, 'histograms': {}, 'gauges': {}}
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _merge(merged, snapshot, gauges):
+    """Add a snapshot (list form) into merged (name -> labels tuple -> value form)"""
+    for name, labels, value in snapshot.get('counters', []):
+        series = merged['counters'].setdefault(name, {})
+        series[tuple(labels)] = series.get(tuple(labels), 0) + value
+    for name, labels, buckets, total, count in snapshot.get('histograms', []):
+        series = merged['histograms'].setdefault(name, {})
+        current = series.get(tuple(labels))
+        if current is None:
+            series[tuple(labels)] = [list(buckets), total, count]
+        else:
+            current[0] = [a + b for a, b in zip(current[0], buckets)]
+            current[1] += total
+            current[2] += count
+    if gauges:
+        for name, labels, value in snapshot.get('gauges', []):
+            series = merged['gauges'].setdefault(name, {})
+            series[tuple(labels)] = series.get(tuple(labels), 0) + value
+
+
+def _dump(merged):
+    """Inverse of _merge: merged form back to snapshot list form"""
+    return {
+        'counters': [[name, list(labels), value]
+                     for name, series in merged['counters'].items() for labels, value in series.items()],
+        'histograms': [[name, list(labels), h[0], h[1], h[2]]
+                       for name, series in merged['histograms'].items() for labels, h in series.items()],
+        'gauges': [],
+    }
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Records MongoDB command durations per collection and command"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._inflight = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = 'admin'
+        self._inflight[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._inflight.pop((event.connection_id, event.request_id), 'unknown')
+        self.metrics.observe('easyxpense_mongo_command_duration_seconds',
+                             (collection, event.command_name), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._inflight.pop((event.connection_id, event.request_id), 'unknown')
+        self.metrics.observe('easyxpense_mongo_command_duration_seconds',
+                             (collection, event.command_name), event.duration_micros / 1e6)
+        self.metrics.inc('easyxpense_mongo_command_failures_total', (collection, event.command_name))
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Tracks pool limits, open and checked-out connections and checkout wait per server"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._pool_sizes = {}
+        # Checkout start times; started and finished events fire on the
+        # thread (or greenlet) doing the checkout
+        self._local = threading.local()
+
+    def _address(self, event):
+        return (f'{event.address[0]}:{event.address[1]}',)
+
+    def _observe_wait(self, event):
+        started = getattr(self._local, 'checkout_started', None)
+        if started is not None:
+            self._local.checkout_started = None
+            self.metrics.observe('easyxpense_mongo_pool_checkout_wait_seconds', self._address(event),
+                                 time.perf_counter() - started)
+
+    def pool_created(self, event):
+        size = event.options.get('maxPoolSize', common.MAX_POOL_SIZE)
+        self._pool_sizes[event.address] = size
+        self.metrics.add_gauge('easyxpense_mongo_pool_max_size', self._address(event), size)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        size = self._pool_sizes.pop(event.address, 0)
+        self.metrics.add_gauge('easyxpense_mongo_pool_max_size', self._address(event), -size)
+
+    def connection_created(self, event):
+        self.metrics.add_gauge('easyxpense_mongo_pool_connections', self._address(event), 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.metrics.add_gauge('easyxpense_mongo_pool_connections', self._address(event), -1)
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event)
+        self.metrics.inc('easyxpense_mongo_pool_checkout_failures_total', (str(event.reason),))
+
+    def connection_checked_out(self, event):
+        self._observe_wait(event)
+        self.metrics.add_gauge('easyxpense_mongo_pool_checked_out', self._address(event), 1)
+
+    def connection_checked_in(self, event):
+        self.metrics.add_gauge('easyxpense_mongo_pool_checked_out', self._address(event), -1)
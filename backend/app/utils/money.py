@@ -2,6 +2,12 @@
 Money handling utilities using integer paisa (paise) to avoid floating-point errors.
 All amounts stored as integers (1 rupee = 100 paisa).
 """
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the batch API falls back to pure Python
+    np = None
 
 def rupees_to_paisa(rupees):
     """Convert rupees (float/int) to paisa (integer)"""
@@ -64,3 +70,117 @@ def split_equally(amount_paisa, num_people):
     assert sum(shares) == amount_paisa, "Split calculation error"
     
     return shares
+
+
+# Batch API: whole arrays of amounts in one call, for bulk ingestion, import
+# tools and recomputation jobs. Results match the scalar functions exactly.
+
+# Per-amount status returned by rupees_to_paisa_batch
+AMOUNT_OK = 0
+AMOUNT_INVALID = 1       # rejected by sanitize_amount (not a number, or out of range)
+AMOUNT_OUT_OF_RANGE = 2  # rejected by rupees_to_paisa/validate_amount_paisa (e.g. rounds to 0, NaN)
+
+MAX_AMOUNT_RUPEES = 10000000   # sanitize_amount's limit
+MAX_AMOUNT_PAISA = 100000000   # validate_amount_paisa's limit
+
+# |frac(amount * 100) - 0.5| below this is treated as a possible tie and
+# rounded by the scalar code instead
+TIE_MARGIN = 1e-4
+
+
+def _to_float(value):
+    """float(value), or -1.0 (always invalid) when it does not convert"""
+    try:
+        return float(value)
+    except (ValueError, TypeError, OverflowError):
+        return -1.0
+
+
+def _scalar_paisa(amount):
+    """sanitize_amount -> rupees_to_paisa -> validate_amount_paisa for one float"""
+    if amount <= 0 or amount > MAX_AMOUNT_RUPEES:
+        return 0, AMOUNT_INVALID
+    try:
+        amount_paisa = round(round(amount, 2) * 100)
+    except ValueError:
+        return 0, AMOUNT_OUT_OF_RANGE
+    if not (0 < amount_paisa <= MAX_AMOUNT_PAISA):
+        return 0, AMOUNT_OUT_OF_RANGE
+    return amount_paisa, AMOUNT_OK
+
+
+def rupees_to_paisa_batch(amounts):
+    """
+    Convert and validate many rupee amounts at once.
+    
+    `amounts` holds raw values (numbers or numeric strings, as they arrive in
+    JSON) or is a float array. Returns (paisa, status), two int64 sequences
+    (NumPy arrays when NumPy is installed, array('q') otherwise): paisa is 0
+    wherever status is not AMOUNT_OK.
+    
+    The NumPy path rounds with rint(amount * 100), which equals
+    round(round(amount, 2) * 100) away from half-paisa ties; amounts within
+    TIE_MARGIN of a tie go through the scalar code so results are identical.
+    """
+    if np is None:
+        results = [_scalar_paisa(_to_float(value)) for value in amounts]
+        return array('q', [amount_paisa for amount_paisa, _ in results]), array('q', [code for _, code in results])
+    
+    if isinstance(amounts, np.ndarray):
+        values = amounts.astype(np.float64)
+    else:
+        values = np.fromiter((_to_float(value) for value in amounts), dtype=np.float64)
+    
+    status = np.full(len(values), AMOUNT_INVALID, dtype=np.int64)
+    # Written like sanitize_amount's check so NaN passes it, as it does there
+    in_range = ~((values <= 0) | (values > MAX_AMOUNT_RUPEES))
+    finite = in_range & np.isfinite(values)
+    
+    scaled = np.where(finite, values, 0) * 100
+    paisa = np.rint(scaled).astype(np.int64)
+    
+    fraction = scaled - np.floor(scaled)
+    for i in np.flatnonzero(finite & (np.abs(fraction - 0.5) < TIE_MARGIN)).tolist():
+        paisa[i] = round(round(float(values[i]), 2) * 100)
+    
+    valid = finite & (paisa > 0) & (paisa <= MAX_AMOUNT_PAISA)
+    status[in_range & ~valid] = AMOUNT_OUT_OF_RANGE
+    status[valid] = AMOUNT_OK
+    paisa[~valid] = 0
+    return paisa, status
+
+
+def split_equally_batch(amounts_paisa, counts):
+    """
+    split_equally for many amounts at once.
+    
+    Returns (shares, offsets): the shares of amount i are
+    shares[offsets[i]:offsets[i + 1]], with the remainder going to the first
+    people exactly as split_equally does. Both are int64 sequences (NumPy
+    arrays when NumPy is installed, array('q') otherwise).
+    """
+    if np is None:
+        shares = []
+        offsets = [0]
+        for amount_paisa, count in zip(amounts_paisa, counts):
+            if count <= 0:
+                raise ValueError("Number of people must be positive")
+            # Same shares as split_equally, without its per-person loop
+            base, remainder = divmod(amount_paisa, count)
+            shares += [base + 1] * remainder
+            shares += [base] * (count - remainder)
+            offsets.append(len(shares))
+        return array('q', shares), array('q', offsets)
+    
+    amounts_paisa = np.asarray(amounts_paisa, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if len(counts) and counts.min() <= 0:
+        raise ValueError("Number of people must be positive")
+    
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    
+    base, remainder = np.divmod(amounts_paisa, counts)
+    position = np.arange(offsets[-1], dtype=np.int64) - np.repeat(offsets[:-1], counts)
+    shares = np.repeat(base, counts) + (position < np.repeat(remainder, counts))
+    return shares, offsets
@@ -0,0 +1,78 @@
+"""
+Per-process MongoDB client.
+
+A MongoClient must not be shared across fork: its pool sockets and monitor
+threads belong to the process that created it. MongoConnection creates the
+client lazily on first use in each process, so gunicorn workers get their
+own client whether or not the app was preloaded in the master.
+"""
+import os
+import threading
+
+from pymongo import MongoClient
+
+
+def mongo_pool_size():
+    """
+    Connection pool size per process, from the worker configuration.
+
+    A worker needs one connection per request it can serve concurrently
+    (1 for sync, GUNICORN_THREADS for gthread, GUNICORN_WORKER_CONNECTIONS
+    for gevent) plus one each for the background reaper and health checker,
+    capped so that all workers together stay within MONGO_CONNECTION_BUDGET.
+    """
+    if os.getenv('MONGO_MAX_POOL_SIZE'):
+        return int(os.getenv('MONGO_MAX_POOL_SIZE'))
+
+    if os.getenv('GUNICORN_WORKER_CLASS', 'sync') in ('gevent', 'eventlet'):
+        concurrency = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+    else:
+        concurrency = int(os.getenv('GUNICORN_THREADS', '1'))
+
+    workers = max(1, int(os.getenv('GUNICORN_WORKERS', '2')))
+    budget = int(os.getenv('MONGO_CONNECTION_BUDGET', '400')) // workers
+    return max(3, min(concurrency + 2, budget, 100))
+
+
+class MongoConnection:
+    def __init__(self, uri, database_name, **client_options):
+        self.uri = uri
+        self.database_name = database_name
+        self.client_options = client_options
+        self._pid = None
+        self._client = None
+        self._database = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        self._ensure_client()
+        return self._client
+
+    @property
+    def database(self):
+        self._ensure_client()
+        if self._database is None or self._database.name != self.database_name:
+            self._database = self._client[self.database_name]
+        return self._database
+
+    def _ensure_client(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # An inherited client is abandoned, not closed: closing it would
+            # touch sockets the parent process is still using
+            self._client = MongoClient(self.uri, **self.client_options)
+            self._database = None
+            self._pid = pid
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._database = None
+            self._pid = None
@@ -0,0 +1,95 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Pages are addressed by the sort key of the last document returned instead of
+an offset, so every page is a bounded index range scan no matter how deep
+the client pages. Cursors are opaque URL-safe strings.
+"""
+import base64
+import binascii
+from datetime import datetime
+from bson import ObjectId, json_util
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Types a cursor may carry for a sort key. Anything else (documents, arrays,
+# regexes, code, ...) would be interpreted as a query operator or pattern.
+CURSOR_VALUE_TYPES = (str, int, float, datetime, ObjectId, type(None))
+
+
+def wants_page(args):
+    """Pagination is opt-in so existing clients keep receiving plain arrays"""
+    return 'limit' in args or 'cursor' in args
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse the limit query parameter, clamped to [1, maximum]"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(values):
+    """Encode sort key values (datetime, ObjectId, str, ...) as an opaque cursor"""
+    raw = json_util.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor produced by encode_cursor, expecting `size` sort keys"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _after(sort, values):
+    """
+    Filter matching documents strictly after `values` in `sort` order:
+    (a > va) OR (a = va AND b > vb) OR ...
+    """
+    for (field, _), value in zip(sort, values):
+        if not isinstance(value, CURSOR_VALUE_TYPES) or (field == '_id' and not isinstance(value, ObjectId)):
+            raise ValueError("Invalid cursor")
+
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {sort[j][0]: values[j] for j in range(i)}
+        clause[field] = {'$gt' if direction > 0 else '$lt': values[i]}
+        clauses.append(clause)
+    return {'$or': clauses}
+
+
+def paginate(collection, query, sort, limit, cursor=None, projection=None):
+    """
+    Fetch one page of `collection` matching `query`.
+
+    `sort` is a list of (field, direction) pairs ending in a unique field
+    (normally _id). Returns (documents, next_cursor); next_cursor is None on
+    the last page.
+    """
+    if cursor:
+        query = {'$and': [query, _after(sort, decode_cursor(cursor, len(sort)))]}
+    if projection:
+        # The next cursor is built from the sort fields, so always fetch them
+        projection = {**projection, **{field: 1 for field, _ in sort}}
+
+    documents = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor([last.get(field) for field, _ in sort])
+
+    return documents, next_cursor
@@ -0,0 +1,40 @@
+"""
+Read-path helpers: list projections and the opt-in raw BSON mode.
+
+List routes only fetch the fields they return (an allowlist per collection,
+optionally narrowed with ?fields=a,b). With MONGO_RAW_BSON=true, list and
+export reads return RawBSONDocument, which keeps each document as its wire
+bytes; the JSON provider decodes it in one call while serializing instead of
+pymongo building a dict per document up front.
+"""
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+
+def list_projection(fields, allowed):
+    """
+    Projection for a list response: every allowed field, or only those
+    requested in a comma separated `fields` argument. _id is always included.
+    Raises ValueError for fields outside the allowlist.
+    """
+    if not fields:
+        return {field: 1 for field in allowed}
+
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in allowed and field != '_id']
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return {field: 1 for field in requested}
+
+
+def read_collection(collection, raw=False):
+    """`collection`, returning RawBSONDocument results when raw is set"""
+    if not raw:
+        return collection
+    return collection.with_options(
+        codec_options=CodecOptions(
+            document_class=RawBSONDocument,
+            tz_aware=collection.codec_options.tz_aware,
+            tzinfo=collection.codec_options.tzinfo
+        )
+    )
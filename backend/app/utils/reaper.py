@@ -0,0 +1,75 @@
+"""
+Background removal of deleted groups' data.
+
+DELETE /api/groups/<id> only tombstones the group. Each worker runs a
+GroupReaper thread that leases tombstoned groups and deletes their
+expenses, settlements and friends in bounded batches; progress lives on the
+group document, so a crash or restart resumes where it stopped. The
+tombstone itself is kept for a grace period and the data swept once more
+before it is purged, so a write that raced the delete is not left behind.
+"""
+import logging
+import os
+import threading
+
+from app.models.balance import Balance
+from app.models.group import Group
+
+logger = logging.getLogger(__name__)
+
+
+def reap_deleted_groups(db, batch_size=1000, lease_seconds=60, limit=None):
+    """Reap tombstoned groups until none are claimable (or `limit` groups). Returns their ids."""
+    group_model = Group(db)
+    reaped = []
+    while limit is None or len(reaped) < limit:
+        group_id = group_model.claim_deleted_group(lease_seconds)
+        if group_id is None:
+            break
+        group_model.reap_group_data(group_id, batch_size, lease_seconds)
+        # Drop ledger rows written for the group while it was being reaped
+        Balance(db).drop_group(str(group_id))
+        if group_model.purge_group(group_id):
+            logger.info('Reaped deleted group %s', group_id)
+        else:
+            # Swept again (and purged) once the grace period is over
+            group_model.defer_purge(group_id)
+        reaped.append(group_id)
+    return reaped
+
+
+class GroupReaper:
+    def __init__(self, app, interval=30, batch_size=1000, enabled=True):
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self._pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start the reaper thread in this process (call after fork, e.g. per request)"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+        threading.Thread(target=self._run, name='group-reaper', daemon=True).start()
+
+    def wake(self):
+        """Reap now instead of at the next interval"""
+        self.ensure_started()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            if self.app.db is not None:
+                try:
+                    reap_deleted_groups(self.app.db, self.batch_size)
+                except Exception as e:
+                    logger.error('Group reaper failed: %s', e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1 @@
+# Benchmarks package (run modules with `python -m benchmarks.<name>` from backend/)
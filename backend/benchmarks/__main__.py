@@ -0,0 +1,61 @@
+"""
+Benchmark suite for the debt engine and API routes.
+
+Usage (from backend/):
+    python -m benchmarks [--members 20] [--expenses 2000] [--settlement-ratio 0.2]
+                         [--iterations 20] [--skip-routes] [--mongomock] [--allow-remote]
+                         [--output results.json] [--baseline previous.json]
+
+Route benchmarks use MONGO_URI (a local MongoDB unless --allow-remote; data
+goes to a separate EasyXpenseBench database) or --mongomock for an in-memory
+stand-in.
+"""
+import argparse
+import json
+import logging
+
+from bson import ObjectId
+
+from benchmarks import bench_debt_engine, bench_routes
+from benchmarks.harness import print_results, save_results
+from benchmarks.synthetic import generate_group
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--expenses', type=int, default=2000)
+    parser.add_argument('--settlement-ratio', type=float, default=0.2)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-routes', action='store_true')
+    parser.add_argument('--mongomock', action='store_true', help='Run routes against mongomock instead of MONGO_URI')
+    parser.add_argument('--allow-remote', action='store_true', help='Allow a MONGO_URI that is not on this machine')
+    parser.add_argument('--output', help='Write results JSON to this path')
+    parser.add_argument('--baseline', help='Compare against a previous results JSON')
+    args = parser.parse_args()
+
+    # Request logging would dominate route timings
+    logging.disable(logging.INFO)
+
+    group_id = str(ObjectId())
+    group = generate_group(args.members, args.expenses, args.settlement_ratio, group_id=group_id, seed=args.seed)
+
+    results = bench_debt_engine.run(group, args.iterations)
+    if not args.skip_routes:
+        results.update(bench_routes.run(group, group_id, args.iterations, use_mongomock=args.mongomock,
+                                          allow_remote=args.allow_remote))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        params = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}
+        save_results(args.output, 'easyxpense', params, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Response compression: CPU time vs bytes saved for gzip levels and brotli
+qualities (when the Brotli package is installed), on a synthetic group's
+expense list (one buffered JSON body) and its NDJSON export (streamed line
+by line through the incremental compressor).
+
+Usage (from backend/):
+    python -m benchmarks.bench_compression [--members 20] [--expenses 5000] [--iterations 10]
+"""
+import argparse
+import gzip
+
+from bson import ObjectId
+
+from app.utils import compression
+from app.utils.compression import Compressor
+from app.utils.json_provider import dumps_bytes
+from benchmarks.harness import measure, print_results
+from benchmarks.synthetic import generate_group
+
+
+def payloads(group):
+    """The expense list response body and the export's NDJSON lines"""
+    for document in group['expenses'] + group['settlements']:
+        document['_id'] = ObjectId()
+    body = dumps_bytes({'success': True, 'expenses': group['expenses']})
+    lines = [dumps_bytes({'type': 'expense', 'data': document}) + b'\n' for document in group['expenses']]
+    lines += [dumps_bytes({'type': 'settlement', 'data': document}) + b'\n' for document in group['settlements']]
+    return body, lines
+
+
+def settings():
+    yield 'gzip', 1
+    yield 'gzip', 4
+    yield 'gzip', 6
+    yield 'gzip', 9
+    if compression.brotli is not None:
+        yield 'br', 1
+        yield 'br', 4
+        yield 'br', 9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--expenses', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    group = generate_group(args.members, args.expenses, group_id=str(ObjectId()), seed=args.seed)
+    body, lines = payloads(group)
+    export_size = sum(len(line) for line in lines)
+
+    results = {}
+    sizes = {}
+    for encoding, level in settings():
+        compressor = Compressor(gzip_level=level, brotli_quality=level)
+
+        name = f'list body, {encoding} {level}'
+        compressed = compressor.compress(body, encoding)
+        if encoding == 'gzip':
+            assert gzip.decompress(compressed) == body
+        results[name] = measure(lambda: compressor.compress(body, encoding), args.iterations)
+        sizes[name] = (len(body), len(compressed))
+
+        name = f'export stream, {encoding} {level}'
+        streamed = b''.join(compressor.compress_stream(iter(lines), encoding))
+        if encoding == 'gzip':
+            assert gzip.decompress(streamed) == b''.join(lines)
+        results[name] = measure(lambda: b''.join(compressor.compress_stream(iter(lines), encoding)), args.iterations)
+        sizes[name] = (export_size, len(streamed))
+
+    if compression.brotli is None:
+        print('Brotli is not installed; only gzip was measured (pip install Brotli)')
+    print_results(results)
+    print()
+    print(f'{"payload":<44} {"raw KiB":>10} {"sent KiB":>10} {"saved":>8} {"MiB/s":>8}')
+    for name, (raw, sent) in sizes.items():
+        rate = raw / 1024 / 1024 / (results[name]['p50_ms'] / 1000)
+        print(f'{name:<44} {raw / 1024:>10.1f} {sent / 1024:>10.1f} {1 - sent / raw:>8.1%} {rate:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Load test against a running server: fires concurrent requests and reports
+throughput, latency and effective concurrency (Little's law: throughput x
+mean latency). With sync workers effective concurrency cannot exceed the
+worker count; with GUNICORN_WORKER_CLASS=gevent it should.
+
+Usage (from backend/, with the server running):
+    GUNICORN_WORKER_CLASS=gevent gunicorn wsgi:app -c gunicorn.conf.py
+    python -m benchmarks.bench_concurrency --url http://localhost:10000/api/debts --concurrency 50 --requests 1000
+"""
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.harness import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:10000/api/debts')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = [args.requests]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(args.url, timeout=args.timeout) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    throughput = len(latencies) / total
+    mean_ms = sum(latencies) / len(latencies)
+    print(f'requests: {len(latencies)} in {total:.2f}s, statuses: {statuses}')
+    print(f'throughput: {throughput:.1f} req/s')
+    print(f'latency ms: p50 {percentile(latencies, 50):.1f}  p99 {percentile(latencies, 99):.1f}  mean {mean_ms:.1f}')
+    print(f'effective concurrency: {throughput * mean_ms / 1000:.1f}')
+
+
+if __name__ == '__main__':
+    main()
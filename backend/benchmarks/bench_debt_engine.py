@@ -0,0 +1,20 @@
+"""
+Debt engine benchmarks: balance folds and settlement optimizers called
+directly on a synthetic group.
+"""
+from app.utils import debt_optimizer
+from benchmarks.harness import measure
+
+
+def run(group, iterations=20):
+    expenses = group['expenses']
+    settlements = group['settlements']
+    balances = debt_optimizer.calculate_net_balances(expenses, settlements)
+
+    cases = {
+        'calculate_net_balances': lambda: debt_optimizer.calculate_net_balances(expenses, settlements),
+        'optimize_settlements': lambda: debt_optimizer.optimize_settlements(balances),
+        'optimize_settlements_exact': lambda: debt_optimizer.optimize_settlements_exact(balances),
+        'calculate_optimized_debts': lambda: debt_optimizer.calculate_optimized_debts(expenses, settlements),
+    }
+    return {f'engine {name}': measure(fn, iterations) for name, fn in cases.items()}
@@ -0,0 +1,57 @@
+"""
+Exact vs greedy settlement solver: solve time and transfer count by group size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_exact_solver [--max-members 20] [--trials 5] [--budget-ms 2000] [--distinct]
+
+--distinct draws every balance independently, the worst case for the exact
+solver (no repeated amounts to collapse).
+"""
+import argparse
+import random
+import time
+
+from app.utils.debt_optimizer import optimize_settlements, optimize_settlements_exact
+
+
+def random_balances(members, rng, distinct=False):
+    """Zero-sum balances (paisa) with realistic repeats so subgroups can cancel"""
+    if distinct:
+        amounts = [rng.randint(1, 500000) * rng.choice([-1, 1]) for _ in range(members - 1)]
+    else:
+        amounts = [rng.choice([100, 250, 500, 1000, 1500]) * rng.choice([-1, 1]) for _ in range(members - 1)]
+    amounts.append(-sum(amounts))
+    return {f'member{i}': amount for i, amount in enumerate(amounts)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-members', type=int, default=20)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=2000)
+    parser.add_argument('--distinct', action='store_true')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f'{"members":>8} {"greedy ms":>10} {"exact ms":>10} {"greedy tx":>10} {"exact tx":>9}')
+    for members in range(4, args.max_members + 1, 2):
+        greedy_time = exact_time = 0.0
+        greedy_tx = exact_tx = 0
+        for _ in range(args.trials):
+            balances = random_balances(members, rng, args.distinct)
+
+            start = time.perf_counter()
+            greedy_tx += len(optimize_settlements(balances))
+            greedy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            exact_tx += len(optimize_settlements_exact(balances, time_budget=args.budget_ms / 1000))
+            exact_time += time.perf_counter() - start
+
+        print(f'{members:>8} {greedy_time * 1000 / args.trials:>10.3f} {exact_time * 1000 / args.trials:>10.3f} '
+              f'{greedy_tx / args.trials:>10.1f} {exact_tx / args.trials:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
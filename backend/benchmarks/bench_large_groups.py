@@ -0,0 +1,104 @@
+"""
+Greedy settlement matcher and balance fold on very large groups: wall time,
+peak traced memory and transfer count.
+
+The matcher is compared with the previous dict-per-person implementation
+(kept below as a reference) and checked to produce the same plan. Time is
+the best of --repeat untraced runs; memory comes from a separate traced run,
+since tracemalloc slows allocation-heavy code down.
+
+Usage (from backend/):
+    python -m benchmarks.bench_large_groups [--sizes 1000,10000,100000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from app.utils import debt_optimizer
+
+
+def reference_optimize_settlements(balances):
+    """The dict-per-person greedy matcher optimize_settlements replaced."""
+    debtors = [{'name': p, 'amount': -b} for p, b in balances.items() if b < 0]
+    creditors = [{'name': p, 'amount': b} for p, b in balances.items() if b > 0]
+    debtors.sort(key=lambda x: x['amount'], reverse=True)
+    creditors.sort(key=lambda x: x['amount'], reverse=True)
+
+    settlements = []
+    i, j = 0, 0
+    while i < len(debtors) and j < len(creditors):
+        debtor = debtors[i]
+        creditor = creditors[j]
+        settle_amount = min(debtor['amount'], creditor['amount'])
+        if settle_amount > 0:
+            settlements.append({'from': debtor['name'], 'to': creditor['name'], 'amount_paisa': settle_amount})
+        debtor['amount'] -= settle_amount
+        creditor['amount'] -= settle_amount
+        if debtor['amount'] == 0:
+            i += 1
+        if creditor['amount'] == 0:
+            j += 1
+    return settlements
+
+
+def measure(fn, args, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def random_balances(members, rng):
+    amounts = [rng.randint(-500000, 500000) for _ in range(members - 1)]
+    amounts.append(-sum(amounts))
+    return {f'member{i}': amount for i, amount in enumerate(amounts)}
+
+
+def random_expenses(members, count, rng):
+    expenses = []
+    for _ in range(count):
+        shares = rng.sample(range(members), min(members, 4))
+        expenses.append({
+            'payer': f'member{shares[0]}',
+            'amount_paisa': 400 * len(shares),
+            'participant_shares': [{'name': f'member{i}', 'share_paisa': 400} for i in shares]
+        })
+    return expenses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print(f'{"members":>8} {"algorithm":>12} {"ms":>10} {"peak KiB":>10} {"transfers":>10}')
+    for size in (int(value) for value in args.sizes.split(',')):
+        balances = random_balances(size, rng)
+        plans = []
+        for label, fn in (('reference', reference_optimize_settlements),
+                          ('greedy', debt_optimizer.optimize_settlements)):
+            result, elapsed, peak = measure(fn, (balances,), args.repeat)
+            plans.append(result)
+            print(f'{size:>8} {label:>12} {elapsed * 1000:>10.1f} {peak / 1024:>10.0f} {len(result):>10}')
+        if plans[0] != plans[1]:
+            raise SystemExit(f'optimize_settlements differs from the reference at {size} members')
+
+        expenses = random_expenses(size, size * 2, rng)
+        _, elapsed, peak = measure(debt_optimizer.calculate_net_balances, (expenses, []), args.repeat)
+        print(f'{size:>8} {"fold":>12} {elapsed * 1000:>10.1f} {peak / 1024:>10.0f} {"-":>10}')
+
+
+if __name__ == '__main__':
+    main()
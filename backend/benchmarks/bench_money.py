@@ -0,0 +1,87 @@
+"""
+Money kernel: scalar sanitize/convert/validate/split loop vs the batch API
+(NumPy and pure-Python paths), with a parity check on every run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_money [--rows 100000] [--iterations 5]
+"""
+import argparse
+import random
+
+from app.utils import money
+from app.utils.sanitize import sanitize_amount
+from benchmarks.harness import measure, print_results
+
+
+def random_rows(count, seed):
+    """Raw amounts as they arrive in JSON (incl. half-paisa ties) and participant counts"""
+    rng = random.Random(seed)
+    amounts = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            amounts.append(rng.randint(1, 10000000) / 100)
+        elif kind < 0.9:
+            amounts.append(rng.randint(1, 10000000) / 1000)
+        else:
+            amounts.append(rng.choice([str(rng.randint(1, 5000)), '0.004', 'abc', None, -5, 2e7]))
+    counts = [rng.randint(1, 12) for _ in range(count)]
+    return amounts, counts
+
+
+def scalar(amounts, counts):
+    """What bulk ingestion did per row before the batch API"""
+    paisa = []
+    shares = []
+    for amount, count in zip(amounts, counts):
+        rupees = sanitize_amount(amount)
+        if rupees is None:
+            paisa.append(0)
+            continue
+        try:
+            amount_paisa = money.rupees_to_paisa(rupees)
+            money.validate_amount_paisa(amount_paisa)
+        except ValueError:
+            paisa.append(0)
+            continue
+        paisa.append(amount_paisa)
+        shares.extend(money.split_equally(amount_paisa, count))
+    return paisa, shares
+
+
+def batch(amounts, counts):
+    paisa, status = money.rupees_to_paisa_batch(amounts)
+    valid = [i for i, code in enumerate(status.tolist()) if code == money.AMOUNT_OK]
+    paisa = paisa.tolist()
+    shares, _ = money.split_equally_batch([paisa[i] for i in valid], [counts[i] for i in valid])
+    return paisa, shares.tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    amounts, counts = random_rows(args.rows, args.seed)
+    expected = scalar(amounts, counts)
+
+    results = {f'scalar loop ({args.rows} rows)': measure(lambda: scalar(amounts, counts), args.iterations)}
+
+    if money.np is not None:
+        assert batch(amounts, counts) == expected, 'NumPy batch path differs from the scalar functions'
+        results[f'batch, numpy ({args.rows} rows)'] = measure(lambda: batch(amounts, counts), args.iterations)
+
+    np, money.np = money.np, None
+    try:
+        assert batch(amounts, counts) == expected, 'Pure-Python batch path differs from the scalar functions'
+        results[f'batch, pure python ({args.rows} rows)'] = measure(lambda: batch(amounts, counts), args.iterations)
+    finally:
+        money.np = np
+
+    print_results(results)
+
+
+if __name__ == '__main__':
+    main()
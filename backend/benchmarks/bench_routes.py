@@ -0,0 +1,100 @@
+"""
+API route benchmarks: seed one synthetic group and drive every GET route
+through the Flask test client.
+
+Runs against the EasyXpenseBench database on MONGO_URI, which must be a
+local server unless allow_remote is set, or against an in-memory mongomock
+stand-in when use_mongomock is set. mongomock lacks $unionWith, so the
+aggregate debts engine only runs against real MongoDB.
+"""
+import os
+
+from benchmarks.harness import bench_mongo_uri, measure
+
+BENCH_DATABASE = 'EasyXpenseBench'
+
+
+def create_bench_app(use_mongomock=False, allow_remote=False):
+    if use_mongomock:
+        import mongomock
+        from app.utils import mongo
+        mongo.MongoClient = mongomock.MongoClient
+        os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017')
+    else:
+        os.environ['MONGO_URI'] = bench_mongo_uri(allow_remote)
+    # Never benchmark against the application database: chosen before the
+    # app exists, so index builds and warmup only ever touch the bench one
+    os.environ['MONGO_DATABASE'] = BENCH_DATABASE
+    # Rate limits would reject the benchmark's own request loop
+    os.environ.setdefault('ADMISSION_CONTROL', 'false')
+
+    from app import create_app
+    app = create_app()
+    # Connect and warm up before timing anything (requests get 503 until ready)
+    app.health.check()
+    return app
+
+
+def seed(app, group, group_id):
+    from datetime import datetime
+    from bson import ObjectId
+    from app.models.balance import Balance, ALL_GROUPS
+    from app.models.indexes import ensure_indexes
+
+    db = app.db
+    for name in ('expenses', 'settlements', 'friends', 'groups', 'balances', 'group_versions'):
+        db[name].delete_many({})
+    ensure_indexes(db)
+
+    db.groups.insert_one({'_id': ObjectId(group_id), 'name': 'Benchmark', 'group_code': 'BENCH1',
+                          'created_at': datetime.utcnow()})
+    for name in ('friends', 'expenses', 'settlements'):
+        if group[name]:
+            db[name].insert_many([dict(doc) for doc in group[name]])
+
+    ledger = Balance(db)
+    ledger.rebuild(group_id)
+    ledger.rebuild(ALL_GROUPS)
+
+
+def run(group, group_id, iterations=20, use_mongomock=False, allow_remote=False):
+    app = create_bench_app(use_mongomock, allow_remote)
+    seed(app, group, group_id)
+    client = app.test_client()
+
+    def get(url, uncached=False):
+        def call():
+            if uncached:
+                app.debts_cache.clear()
+            response = client.get(url)
+            response.get_data()
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}')
+        return call
+
+    scoped = f'group_id={group_id}'
+    routes = {
+        'GET /health': get('/health'),
+        'GET /api/health': get('/api/health'),
+        'GET /api/groups': get('/api/groups'),
+        'GET /api/friends': get(f'/api/friends?{scoped}'),
+        'GET /api/expenses': get(f'/api/expenses?{scoped}'),
+        'GET /api/expenses?limit=50': get(f'/api/expenses?{scoped}&limit=50'),
+        'GET /api/settlements': get(f'/api/settlements?{scoped}'),
+        'GET /api/debts (cached)': get(f'/api/debts?{scoped}'),
+        'GET /api/debts engine=ledger': get(f'/api/debts?{scoped}', uncached=True),
+        'GET /api/debts engine=python': get(f'/api/debts?{scoped}&engine=python', uncached=True),
+        'GET /api/debts optimize=exact': get(f'/api/debts?{scoped}&optimize=exact', uncached=True),
+        'GET /api/debts optimize=false': get(f'/api/debts?{scoped}&optimize=false', uncached=True),
+        'GET /api/groups/<id>/export': get(f'/api/groups/{group_id}/export'),
+    }
+    if not use_mongomock:
+        routes['GET /api/debts engine=aggregate'] = get(f'/api/debts?{scoped}&engine=aggregate', uncached=True)
+
+    results = {}
+    for name, fn in routes.items():
+        try:
+            results[f'route {name}'] = measure(fn, iterations)
+        except Exception as e:
+            results[f'route {name}'] = {'error': str(e)}
+    return results
@@ -0,0 +1,104 @@
+"""
+Response serialization: per-document conversion loop + Flask's default
+provider (before) vs the BSON-aware provider with orjson and with the
+standard library fallback (after). The wire-to-JSON rows include BSON
+decoding, comparing pymongo's default dict documents with the
+MONGO_RAW_BSON=true RawBSONDocument mode.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--documents 10000] [--iterations 20]
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.utils import json_provider
+from app.utils.json_provider import BSONJSONProvider
+from benchmarks.harness import measure, print_results
+
+
+def expense_documents(count, seed):
+    """Documents shaped like the expenses collection, as pymongo returns them"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    members = [f'member{i}' for i in range(20)]
+    documents = []
+    for _ in range(count):
+        participants = rng.sample(members, rng.randint(2, 6))
+        share = rng.randint(100, 100000)
+        documents.append({
+            '_id': ObjectId(),
+            'description': 'Dinner',
+            'amount_paisa': share * len(participants),
+            'amount': share * len(participants) / 100,
+            'payer': rng.choice(participants),
+            'participants': participants,
+            'participant_shares': [{'name': name, 'share_paisa': share} for name in participants],
+            'date': start + timedelta(minutes=rng.randint(0, 500000)),
+            'currency': 'INR',
+            'group_id': 'bench'
+        })
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    documents = expense_documents(args.documents, args.seed)
+    before_app = Flask('before')
+    before_app.json = DefaultJSONProvider(before_app)
+    after_app = Flask('after')
+    after_app.json = BSONJSONProvider(after_app)
+
+    def before():
+        # What the routes did: convert each document, then jsonify. The
+        # shallow copy (so the input can be reused) is part of the timing.
+        expenses = [dict(expense) for expense in documents]
+        for expense in expenses:
+            expense['_id'] = str(expense['_id'])
+            expense['date'] = expense['date'].isoformat()
+        with before_app.app_context():
+            return before_app.json.response(expenses).get_data()
+
+    def after():
+        with after_app.app_context():
+            return after_app.json.response(documents).get_data()
+
+    blobs = [bson.encode(document) for document in documents]
+
+    def decoded():
+        expenses = [bson.decode(blob) for blob in blobs]
+        with after_app.app_context():
+            return after_app.json.response(expenses).get_data()
+
+    def raw():
+        expenses = [RawBSONDocument(blob) for blob in blobs]
+        with after_app.app_context():
+            return after_app.json.response(expenses).get_data()
+
+    results = {}
+    results[f'default provider + loop ({args.documents} docs)'] = measure(before, args.iterations)
+    if json_provider.orjson is not None:
+        results[f'bson provider, orjson ({args.documents} docs)'] = measure(after, args.iterations)
+    results[f'wire to JSON, dict documents ({args.documents} docs)'] = measure(decoded, args.iterations)
+    results[f'wire to JSON, raw documents ({args.documents} docs)'] = measure(raw, args.iterations)
+    orjson, json_provider.orjson = json_provider.orjson, None
+    try:
+        results[f'bson provider, stdlib ({args.documents} docs)'] = measure(after, args.iterations)
+    finally:
+        json_provider.orjson = orjson
+    print_results(results)
+
+
+if __name__ == '__main__':
+    main()
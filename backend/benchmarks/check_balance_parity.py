@@ -0,0 +1,117 @@
+"""
+Parity check: the aggregation engine (aggregate_net_balances) against the
+Python fold (calculate_net_balances) on randomized groups.
+
+Every trial seeds one synthetic group plus edge-case documents (missing
+payer, empty shares, zero/negative and half-specified settlements, a payer
+outside the participants, unicode names) and a second group that must not
+leak into the first. Exits non-zero on any difference.
+
+Usage (from backend/):
+    MONGO_URI=mongodb://localhost:27017 python -m benchmarks.check_balance_parity [--groups 200] [--allow-remote]
+
+Needs a real MongoDB (4.4+; data goes to the separate EasyXpenseBench
+database, and MONGO_URI must be local unless --allow-remote): mongomock
+implements neither $unionWith nor field paths inside array literals, so it
+cannot evaluate the pipeline. The same comparison runs under pytest as
+tests/test_balance_parity.py, which CI points at a MongoDB service container.
+"""
+import argparse
+import random
+import sys
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from app.utils.balance_pipeline import aggregate_net_balances
+from app.utils.debt_optimizer import calculate_net_balances
+from benchmarks.harness import bench_mongo_uri
+from benchmarks.synthetic import generate_group
+
+BENCH_DATABASE = 'EasyXpenseBench'
+
+
+def edge_cases(group_id, rng):
+    """Documents calculate_net_balances skips or treats specially"""
+    name = rng.choice(['Zoë', 'José', 'member0'])
+    expenses = [
+        {'group_id': group_id, 'payer': None, 'amount_paisa': 500,
+         'participant_shares': [{'name': 'member0', 'share_paisa': 500}]},
+        {'group_id': group_id, 'payer': '', 'amount_paisa': 500,
+         'participant_shares': [{'name': 'member0', 'share_paisa': 500}]},
+        {'group_id': group_id, 'payer': 'member1', 'amount_paisa': 900, 'participant_shares': []},
+        # Legacy document without amount_paisa
+        {'group_id': group_id, 'payer': 'member1', 'participant_shares': [{'name': 'member0', 'share_paisa': 40}]},
+        # Payer outside the participants
+        {'group_id': group_id, 'payer': 'outsider', 'amount_paisa': 1001,
+         'participant_shares': [{'name': name, 'share_paisa': 501}, {'name': 'member1', 'share_paisa': 500}]},
+    ]
+    settlements = [
+        {'group_id': group_id, 'fromUser': 'member0', 'toUser': 'member1', 'amount_paisa': 0},
+        {'group_id': group_id, 'fromUser': 'member0', 'toUser': 'member1', 'amount_paisa': -300},
+        {'group_id': group_id, 'fromUser': 'member0', 'toUser': None, 'amount_paisa': 300},
+        {'group_id': group_id, 'fromUser': '', 'toUser': 'member1', 'amount_paisa': 300},
+        {'group_id': group_id, 'fromUser': name, 'toUser': 'outsider', 'amount_paisa': 250},
+    ]
+    return expenses, settlements
+
+
+def compare(db, groups, seed):
+    """
+    Seed and compare `groups` randomized groups in db (its expenses and
+    settlements collections are cleared between trials). Returns one
+    description per group whose aggregate balances differ.
+    """
+    rng = random.Random(seed)
+    failures = []
+    for trial in range(groups):
+        db.expenses.delete_many({})
+        db.settlements.delete_many({})
+
+        group_id = str(ObjectId())
+        group = generate_group(
+            members=rng.randint(1, 30),
+            expenses=rng.randint(0, 300),
+            settlement_ratio=rng.choice([0, 0.1, 0.5, 2]),
+            group_id=group_id,
+            seed=rng.randrange(2 ** 32)
+        )
+        extra_expenses, extra_settlements = edge_cases(group_id, rng)
+        expenses = group['expenses'] + extra_expenses
+        settlements = group['settlements'] + extra_settlements
+
+        # Another group's data in the same collections must not be counted
+        other = generate_group(members=5, expenses=20, group_id=str(ObjectId()), seed=trial)
+
+        db.expenses.insert_many([dict(doc) for doc in expenses + other['expenses']])
+        db.settlements.insert_many([dict(doc) for doc in settlements + other['settlements']])
+
+        expected = calculate_net_balances(expenses, settlements)
+        actual = aggregate_net_balances(db, {'group_id': group_id})
+        if actual != expected:
+            diff = {member: (expected.get(member), actual.get(member))
+                    for member in set(expected) | set(actual) if expected.get(member) != actual.get(member)}
+            failures.append(f'group {trial}: {len(diff)} members differ (expected, aggregate): {diff}')
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', type=int, default=200, help='Randomized groups to compare')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--allow-remote', action='store_true', help='Allow a MONGO_URI that is not on this machine')
+    args = parser.parse_args()
+
+    db = MongoClient(bench_mongo_uri(args.allow_remote))[BENCH_DATABASE]
+
+    failures = compare(db, args.groups, args.seed)
+    for failure in failures:
+        print(failure)
+
+    print(f'{args.groups - len(failures)}/{args.groups} groups match')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Timing, memory and result-file helpers shared by the benchmark suite"""
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+
+# Hosts the benchmarks may write to without --allow-remote
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+def is_local_uri(uri):
+    """True if every host in a mongodb:// URI is this machine (mongodb+srv never is)"""
+    scheme, _, rest = uri.partition('://')
+    if scheme != 'mongodb':
+        return False
+    hosts = rest.split('/', 1)[0].rpartition('@')[2]
+    for host in hosts.split(','):
+        if host.startswith('['):
+            name = host[1:].partition(']')[0]
+        else:
+            name = host.partition(':')[0]
+        # Unix domain sockets are given as percent-encoded paths
+        if name not in LOCAL_HOSTS and not name.lower().startswith('%2f'):
+            return False
+    return True
+
+
+def bench_mongo_uri(allow_remote=False):
+    """MONGO_URI (default: local MongoDB); exits unless it is local or allow_remote is set"""
+    uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+    if not allow_remote and not is_local_uri(uri):
+        raise SystemExit('MONGO_URI is not a local MongoDB; benchmarks delete and seed data, '
+                         'pass --allow-remote to run against it anyway')
+    return uri
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def measure(fn, iterations=20, warmup=1):
+    """
+    Time fn() over `iterations` calls and trace peak memory of one extra call.
+    Returns throughput, latency percentiles (ms) and peak KiB.
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    total = time.perf_counter() - started
+
+    # Traced separately so tracemalloc overhead does not skew the timings
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'throughput_per_s': round(iterations / total, 2) if total else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'peak_kib': round(peak / 1024, 1)
+    }
+
+
+def save_results(path, suite, params, results):
+    with open(path, 'w') as f:
+        json.dump({
+            'suite': suite,
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'params': params,
+            'results': results
+        }, f, indent=2)
+
+
+def print_results(results, baseline=None):
+    """Print a results table, with p50 change against a previous results file"""
+    previous = (baseline or {}).get('results', {})
+    print(f'{"benchmark":<44} {"ops/s":>10} {"p50 ms":>9} {"p99 ms":>9} {"peak KiB":>10} {"p50 vs base":>12}')
+    for name, result in results.items():
+        if 'error' in result:
+            print(f'{name:<44} error: {result["error"]}')
+            continue
+        change = ''
+        before = previous.get(name, {}).get('p50_ms')
+        if before:
+            change = f'{(result["p50_ms"] - before) / before * 100:+.1f}%'
+        print(f'{name:<44} {result["throughput_per_s"]:>10} {result["p50_ms"]:>9} '
+              f'{result["p99_ms"]:>9} {result["peak_kib"]:>10} {change:>12}')
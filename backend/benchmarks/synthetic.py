@@ -0,0 +1,74 @@
+"""
+Synthetic group generator.
+
+Builds expense, settlement and friend documents in the same shape the API
+stores them (integer paisa, equal splits via split_equally), so benchmarks
+exercise realistic data without going through the HTTP layer.
+"""
+import random
+from datetime import datetime, timedelta
+
+from app.utils.money import paisa_to_rupees, split_equally
+
+
+def generate_group(members=10, expenses=1000, settlement_ratio=0.2, group_id=None, seed=42):
+    """
+    Returns {'members', 'friends', 'expenses', 'settlements'} for one group.
+
+    settlement_ratio is the number of settlements per expense.
+    """
+    rng = random.Random(seed)
+    names = [f'member{i}' for i in range(members)]
+    start = datetime(2024, 1, 1)
+
+    def scoped(document):
+        if group_id:
+            document['group_id'] = group_id
+        return document
+
+    friends = [
+        scoped({'name': name, 'email': f'{name}@example.com', 'created_at': start})
+        for name in names
+    ]
+
+    expense_docs = []
+    for i in range(expenses):
+        payer = rng.choice(names)
+        participants = rng.sample(names, rng.randint(1, min(members, 8)))
+        if payer not in participants:
+            participants.append(payer)
+        amount_paisa = rng.randint(100, 500000)
+        shares = split_equally(amount_paisa, len(participants))
+        expense_docs.append(scoped({
+            'description': f'Expense {i}',
+            'amount_paisa': amount_paisa,
+            'amount': paisa_to_rupees(amount_paisa),
+            'payer': payer,
+            'participants': participants,
+            'participant_shares': [
+                {'name': name, 'share_paisa': share} for name, share in zip(participants, shares)
+            ],
+            'date': start + timedelta(minutes=i),
+            'currency': 'INR'
+        }))
+
+    settlement_docs = []
+    if members > 1:
+        for i in range(int(expenses * settlement_ratio)):
+            from_user, to_user = rng.sample(names, 2)
+            amount_paisa = rng.randint(100, 100000)
+            settlement_docs.append(scoped({
+                'fromUser': from_user,
+                'toUser': to_user,
+                'amount_paisa': amount_paisa,
+                'amount': paisa_to_rupees(amount_paisa),
+                'date': start + timedelta(minutes=i, seconds=30),
+                'currency': 'INR'
+            }))
+
+    return {
+        'members': names,
+        'friends': friends,
+        'expenses': expense_docs,
+        'settlements': settlement_docs
+    }
@@ -4,12 +4,21 @@ import multiprocessing
 
 # Server socket
 bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
-backlog = 2048
+# Connections waiting for a worker; a shorter queue bounds how long a request
+# can wait before it is served (the app sheds what it cannot serve in time)
+backlog = int(os.getenv('GUNICORN_BACKLOG', '2048'))
 
 # Worker processes
 workers = int(os.getenv('GUNICORN_WORKERS', '2'))
-worker_class = 'sync'
-worker_connections = 1000
+# 'sync' (default) or 'gevent': cooperative workers keep serving other
+# requests while one waits on MongoDB. The gevent worker monkey-patches
+# before the app is imported, so keep preload_app off.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+# Concurrent requests per gevent worker (ignored by sync workers)
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+# Threads per worker; more than 1 makes sync workers threaded (gthread).
+# The MongoDB pool is sized from these settings (app/utils/mongo.py).
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
 max_requests = 1000
 max_requests_jitter = 50
 timeout = 120
@@ -17,7 +26,9 @@ graceful_timeout = 30
 keepalive = 5
 
 # Logging
-accesslog = '-'
+# The app writes its own sampled access log; set GUNICORN_ACCESS_LOG='' to
+# turn gunicorn's unsampled one off
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
 errorlog = '-'
 loglevel = 'info'
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
@@ -37,3 +48,16 @@ tmp_upload_dir = None
 limit_request_line = 4096
 limit_request_fields = 100
 limit_request_field_size = 8190
+
+
+# Hooks
+def post_worker_init(worker):
+    """Start the worker's MongoDB health checker (connect, warm up) before the first request"""
+    # Claim the metrics for this worker first: done lazily on the first
+    # request it would wipe the pool gauges recorded while connecting
+    metrics = getattr(worker.wsgi, 'metrics', None)
+    if metrics is not None:
+        metrics.ensure_worker()
+    health = getattr(worker.wsgi, 'health', None)
+    if health is not None:
+        health.ensure_started()
@@ -6,4 +6,8 @@ app = create_app()
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
+    # Connect and warm up now rather than on the first request (metrics
+    # first, so the pool gauges recorded while connecting are kept)
+    app.metrics.ensure_worker()
+    app.health.ensure_started()
     app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Aggregation engine vs Python fold on randomized groups (see
+benchmarks/check_balance_parity.py), against a real MongoDB.
+
+Uses MONGO_URI (default: local MongoDB) and the separate EasyXpenseBench
+database; skipped when no MongoDB 4.4+ is reachable there, unless
+PARITY_REQUIRE_MONGO is set (as in CI), which fails instead. Run from
+backend/:
+    MONGO_URI=mongodb://localhost:27017 python -m pytest tests
+"""
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from benchmarks.check_balance_parity import BENCH_DATABASE, compare
+from benchmarks.harness import is_local_uri
+
+PARITY_GROUPS = int(os.getenv('PARITY_GROUPS', '100'))
+
+
+def unavailable(reason):
+    if os.getenv('PARITY_REQUIRE_MONGO'):
+        pytest.fail(reason)
+    pytest.skip(reason)
+
+
+@pytest.fixture(scope='module')
+def bench_db():
+    uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+    if not is_local_uri(uri):
+        unavailable('MONGO_URI is not a local MongoDB; the parity check deletes and seeds data')
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    try:
+        version = client.server_info()['versionArray']
+    except PyMongoError as e:
+        client.close()
+        unavailable(f'MongoDB not reachable at {uri}: {type(e).__name__}')
+    if version[:2] < [4, 4]:
+        client.close()
+        unavailable('aggregation engine needs MongoDB 4.4+ ($unionWith)')
+
+    yield client[BENCH_DATABASE]
+    client.drop_database(BENCH_DATABASE)
+    client.close()
+
+
+def test_aggregate_matches_python_fold(bench_db):
+    failures = compare(bench_db, PARITY_GROUPS, seed=42)
+    assert not failures, '\n'.join(failures)